@@ -1,11 +1,19 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
 from dotenv import load_dotenv
+from sqlalchemy import bindparam, column, event, text, update, values
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import Session, sessionmaker
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Получаем URL базы данных из переменной окружения
 original_db_url = os.getenv("DATABASE_URL")
 
@@ -14,9 +22,318 @@ DATABASE_URL = original_db_url
 if original_db_url and original_db_url.startswith("postgresql://"):
     DATABASE_URL = original_db_url.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(DATABASE_URL, echo=True, poolclass=NullPool)
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Настройки пула соединений (все можно переопределить через переменные окружения)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# 0 отключает кэш подготовленных выражений (нужно при работе через pgbouncer)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+# Сколько соединений открыть заранее при старте бота
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+# Логирование всех SQL-запросов — только для отладки
+DB_ECHO = _env_bool("DB_ECHO", False)
+# Доля занятых соединений, после которой пишем предупреждение в лог
+DB_POOL_SATURATION_WARNING = float(os.getenv("DB_POOL_SATURATION_WARNING", "0.9"))
+
+
+def _engine_options(url: str) -> dict:
+    """Build create_async_engine() keyword arguments for the given URL"""
+    options = {"echo": DB_ECHO}
+    if url and url.startswith("sqlite"):
+        # SQLite не использует сетевые соединения, пул по умолчанию подходит
+        return options
+
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if url and url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        }
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **_engine_options(DATABASE_URL))
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Счётчики использования пула
+pool_metrics = {
+    "checkouts": 0,
+    "connects": 0,
+    "invalidations": 0,
+    "saturation_warnings": 0,
+    "peak_checked_out": 0,
+    # Updates handled, and how many of them ran at least one statement
+    "updates": 0,
+    "db_updates": 0,
+}
+
+
+def get_pool_stats() -> dict:
+    """Return a snapshot of connection pool usage"""
+    pool = engine.sync_engine.pool
+    stats = dict(pool_metrics)
+    if not hasattr(pool, "checkedout"):
+        return stats
+
+    checked_out = pool.checkedout()
+    capacity = pool.size() + max(DB_MAX_OVERFLOW, 0)
+    stats.update(
+        pool_size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=checked_out,
+        overflow=pool.overflow(),
+        capacity=capacity,
+        saturation=round(checked_out / capacity, 3) if capacity else 0.0,
+    )
+    return stats
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics["connects"] += 1
+
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics["checkouts"] += 1
+    stats = get_pool_stats()
+    checked_out = stats.get("checked_out", 0)
+    if checked_out > pool_metrics["peak_checked_out"]:
+        pool_metrics["peak_checked_out"] = checked_out
+    if stats.get("saturation", 0) >= DB_POOL_SATURATION_WARNING:
+        pool_metrics["saturation_warnings"] += 1
+        logger.warning(
+            "Database pool is nearly exhausted: %s of %s connections in use",
+            checked_out, stats["capacity"]
+        )
+
+
+@event.listens_for(engine.sync_engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics["invalidations"] += 1
+
+
+async def warm_up_pool(connections: int = DB_POOL_WARMUP) -> int:
+    """Open pool connections ahead of time so first updates skip the handshake"""
+    pool = engine.sync_engine.pool
+    if hasattr(pool, "size"):
+        connections = min(connections, pool.size())
+
+    opened = []
+    try:
+        for _ in range(max(connections, 0)):
+            connection = await engine.connect()
+            opened.append(connection)
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            await connection.close()
+
+    logger.info("Database pool warmed up with %s connections", len(opened))
+    return len(opened)
+
+
+async def dispose_engine() -> None:
+    """Close all pooled connections"""
+    await engine.dispose()
+
+
+def dialect_insert(session: AsyncSession, table):
+    """Return an INSERT construct that supports ON CONFLICT for the session's database"""
+    if session.bind.dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+async def update_from_values(session: AsyncSession, model, rows: list[dict], increment: tuple = ()) -> None:
+    """
+    Update many rows of `model` by primary key "id" in one statement. Every dict
+    in `rows` has the same keys; columns listed in `increment` are added to the
+    current value instead of replacing it.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    names = [name for name in rows[0] if name != "id"]
+
+    if session.bind.dialect.name == "postgresql":
+        # UPDATE ... FROM (VALUES ...) AS batch (id, ...)
+        batch = values(
+            column("id", table.c.id.type),
+            *(column(name, table.c[name].type) for name in names),
+            name="batch",
+        ).data([tuple(row[key] for key in ["id", *names]) for row in rows])
+        stmt = update(table).where(table.c.id == batch.c.id).values({
+            name: table.c[name] + batch.c[name] if name in increment else batch.c[name]
+            for name in names
+        })
+        await session.execute(stmt)
+        return
+
+    # SQLite can't alias VALUES columns, send the same UPDATE as one executemany
+    stmt = update(table).where(table.c.id == bindparam("b_id")).values({
+        name: table.c[name] + bindparam(f"b_{name}") if name in increment else bindparam(f"b_{name}")
+        for name in names
+    })
+    await session.execute(stmt, [{f"b_{key}": value for key, value in row.items()} for row in rows])
+
+
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+# session.info key of the state kept by unit_of_work()
+UNIT_OF_WORK = "unit_of_work"
+# The unit of work of the update being handled
+current_work: ContextVar[Optional["LazySession"]] = ContextVar("current_work", default=None)
+
+
+@event.listens_for(Session, "after_begin")
+def _on_begin(session, transaction, connection):
+    # Fires once a statement takes a connection, not when the session is created
+    work = session.info.get(UNIT_OF_WORK)
+    if work is not None:
+        work["statements"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(orm_execute_state):
+    # Core UPDATE/DELETE/INSERT and raw SQL are committed even if the caller skips commit()
+    work = orm_execute_state.session.info.get(UNIT_OF_WORK)
+    if work is not None and not orm_execute_state.is_select:
+        work["writes"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _on_flush(session, flush_context):
+    work = session.info.get(UNIT_OF_WORK)
+    if work is not None:
+        work["writes"] = True
+
+
+class LazySession:
+    """
+    Stands in for the AsyncSession of a unit of work and creates it on first
+    use. A pool connection is only checked out by the first statement.
+    """
+
+    __slots__ = ("_work", "_session")
+
+    def __init__(self, work: dict):
+        self._work = work
+        self._session = None
+
+    @property
+    def created(self) -> Optional[AsyncSession]:
+        """The real session, None while nothing has used it"""
+        return self._session
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = async_session()
+            self._session.info[UNIT_OF_WORK] = self._work
+        return getattr(self._session, name)
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """
+    A lazily created session whose writes are committed once when the block
+    exits, or rolled back if it raises. Services only flush inside it, see commit().
+    release_connection() may end a read-only transaction before the block waits on Telegram.
+    """
+    work = {"writes": False, "statements": False, "callbacks": [], "task": asyncio.current_task()}
+    lazy = LazySession(work)
+    token = current_work.set(lazy)
+    pool_metrics["updates"] += 1
+    try:
+        yield lazy
+        session = lazy.created
+        if session is not None:
+            # Blocks that only read end without a COMMIT round trip
+            if work["writes"] or session.new or session.dirty or session.deleted:
+                await session.commit()
+    except BaseException:
+        if lazy.created is not None:
+            await lazy.created.rollback()
+        raise
+    finally:
+        current_work.reset(token)
+        if work["statements"]:
+            pool_metrics["db_updates"] += 1
+        # Hand the connection back before anything else runs
+        if lazy.created is not None:
+            await lazy.created.close()
+    for callback, args in work["callbacks"]:
+        callback(*args)
+
+
+async def release_connection() -> None:
+    """
+    End the current unit of work's transaction if it has only read, so its pool
+    connection isn't held while the update waits on something slow. Later
+    statements start a new transaction. Loaded objects stay usable, the sessions
+    don't expire on commit. A transaction that wrote keeps its connection until
+    the unit of work commits it, so the update still commits or rolls back as a whole.
+    """
+    lazy = current_work.get()
+    # Tasks started by a handler inherit the context but must not commit its session
+    if lazy is None or lazy._work["task"] is not asyncio.current_task():
+        return
+    session = lazy.created
+    if session is None or not session.in_transaction():
+        return
+    if lazy._work["writes"] or session.new or session.dirty or session.deleted:
+        return
+    await session.commit()
+
+
+async def commit(session: AsyncSession) -> None:
+    """Commit the session, or just flush it when a unit of work commits it later"""
+    work = session.info.get(UNIT_OF_WORK)
+    if work is None:
+        await session.commit()
+        return
+    await session.flush()
+    work["writes"] = True
+
+
+def after_commit(session: AsyncSession, callback, *args) -> None:
+    """
+    Call a cache invalidation now, and inside a unit of work once more after it
+    commits, so entries another update cached from the old rows are dropped too
+    """
+    callback(*args)
+    work = session.info.get(UNIT_OF_WORK)
+    if work is not None:
+        work["callbacks"].append((callback, args))
+
+
+def on_commit(session: AsyncSession, callback, *args) -> None:
+    """
+    Apply a cache update only once the writes it reflects are committed: after
+    the unit of work commits, or right away outside one, where commit() already
+    committed. An update that rolls back leaves the cache as it was.
+    """
+    work = session.info.get(UNIT_OF_WORK)
+    if work is None:
+        callback(*args)
+        return
+    work["callbacks"].append((callback, args))
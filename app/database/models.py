@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Enum, Text
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Date, Boolean, Enum, Float, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import enum
@@ -42,6 +42,10 @@ class Word(Base):
     audio_url = Column(String(255), nullable=True)
     
     user_words = relationship("UserWord", back_populates="word")
+    
+    __table_args__ = (
+        Index("ix_words_language_level", "language", "level"),
+    )
 
 class UserWord(Base):
     __tablename__ = "user_words"
@@ -53,9 +57,21 @@ class UserWord(Base):
     next_review = Column(DateTime, default=lambda: datetime.utcnow() + timedelta(days=1))
     review_count = Column(Integer, default=0)
     correct_count = Column(Integer, default=0)
+    # Scheduler state, NULL until the word is reviewed (see app.services.scheduler)
+    stability = Column(Float, nullable=True)
+    difficulty = Column(Float, nullable=True)
+    ease = Column(Float, nullable=True)
+    last_review = Column(DateTime, nullable=True)
     
     user = relationship("User", back_populates="words")
     word = relationship("Word", back_populates="user_words")
+    
+    __table_args__ = (
+        Index("ix_user_words_user_id_next_review", "user_id", "next_review"),
+        Index("ix_user_words_user_id_added_date", "user_id", "added_date"),
+        Index("uq_user_words_user_id_word_id", "user_id", "word_id", unique=True),
+        Index("ix_user_words_user_id_id", "user_id", "id"),
+    )
 
 class Settings(Base):
     __tablename__ = "settings"
@@ -65,4 +81,94 @@ class Settings(Base):
     words_per_day = Column(Integer, default=5)
     language = Column(String(20), nullable=False)
     
-    user = relationship("User", back_populates="settings") 
\ No newline at end of file
+    user = relationship("User", back_populates="settings")
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+
+    id = Column(Integer, primary_key=True)
+    campaign = Column(String(64), nullable=False)
+    dedup_key = Column(String(128), nullable=False, unique=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    reply_markup = Column(Text, nullable=True)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    available_at = Column(DateTime, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_outbox_status_available_at", "status", "available_at"),
+        Index("ix_outbox_campaign_status", "campaign", "status"),
+    )
+
+class FSMState(Base):
+    __tablename__ = "fsm_states"
+
+    # Storage key built by aiogram's DefaultKeyBuilder
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255), nullable=True)
+    data = Column(Text, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_fsm_states_updated_at", "updated_at"),
+    )
+
+class ReviewEvent(Base):
+    __tablename__ = "review_events"
+
+    # Append-only, rows older than the retention period are pruned
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    word_id = Column(Integer, nullable=False)
+    ts = Column(DateTime, nullable=False)
+    correct = Column(Boolean, nullable=False)
+    # "review", "quiz" or "fill_in_blank"
+    mode = Column(String(16), nullable=False)
+    # Time from showing the question to the answer, when known
+    latency_ms = Column(Integer, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_review_events_user_id_ts", "user_id", "ts"),
+        Index("ix_review_events_ts", "ts"),
+    )
+
+class ReviewDailyStat(Base):
+    __tablename__ = "review_daily_stats"
+
+    # Per-user daily totals of review_events, kept after the events are pruned
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    reviews = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
+    # Sum and count of the known latencies, for the average answer time
+    latency_ms_sum = Column(BigInteger, nullable=False, default=0)
+    timed_reviews = Column(Integer, nullable=False, default=0)
+
+class UserSchedulerParams(Base):
+    __tablename__ = "user_scheduler_params"
+
+    # Personal FSRS weights fitted from the user's review_events
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    weights = Column(Text, nullable=False)
+    # Newest review event used, the fit is repeated only after newer events
+    last_event_id = Column(BigInteger, nullable=False)
+    reviews = Column(Integer, nullable=False)
+    loss = Column(Float, nullable=True)
+    fitted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class DailyWordQueue(Base):
+    __tablename__ = "daily_word_queues"
+
+    # Today's new words for a user, prepared by the nightly job
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, nullable=False)
+    language = Column(String(20), nullable=False)
+    level = Column(String(5), nullable=False)
+    # JSON list of word ids, words before `position` were already shown
+    word_ids = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    position = Column(Integer, nullable=False, default=0)
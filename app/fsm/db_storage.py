@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import os
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Mapping, Optional
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from app.database.db import async_session, dialect_insert
+from app.database.models import FSMState
+from app.fsm.state_cache import StateCache, pack_data, unpack_data
+
+logger = logging.getLogger(__name__)
+
+# Conversations untouched for this long are forgotten
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(7 * 24 * 3600)))
+# Buffered changes are written at least this often
+FSM_FLUSH_SECONDS = float(os.getenv("FSM_FLUSH_SECONDS", "1"))
+# ...or as soon as this many keys have changed
+FSM_FLUSH_BATCH_SIZE = int(os.getenv("FSM_FLUSH_BATCH_SIZE", "200"))
+# Cached states not used for this long are dropped from memory
+FSM_CACHE_TTL = int(os.getenv("FSM_CACHE_TTL", "300"))
+FSM_CACHE_MAX_BYTES = int(os.getenv("FSM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+FSM_PRUNE_SECONDS = int(os.getenv("FSM_PRUNE_SECONDS", "3600"))
+# Bot processes that may handle updates of the same chat; above 1 nothing is cached
+FSM_WORKERS = int(os.getenv("FSM_WORKERS", "1"))
+
+
+class StateRecord:
+    __slots__ = ("state", "data")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[dict] = None):
+        self.state = state
+        # Lists of ids are stored packed, see pack_data()
+        self.data = data or {}
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    FSM storage kept in the fsm_states table so conversations survive restarts
+    and can be served by several workers.
+
+    With a single worker, reads are served from an in-process cache and writes
+    are flushed to the database in batches. With several workers (`shared`),
+    every read goes to the database and every write is saved before it returns,
+    so another worker handling the same chat sees the change.
+    """
+
+    def __init__(
+        self,
+        session_factory=async_session,
+        key_builder: KeyBuilder = None,
+        state_ttl: int = FSM_STATE_TTL,
+        flush_interval: float = FSM_FLUSH_SECONDS,
+        flush_batch_size: int = FSM_FLUSH_BATCH_SIZE,
+        cache: StateCache = None,
+        shared: bool = FSM_WORKERS > 1,
+    ):
+        self.session_factory = session_factory
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.cache = cache if cache is not None else StateCache(FSM_CACHE_MAX_BYTES, FSM_CACHE_TTL)
+        self.shared = shared
+        # Records changed since the last flush, by storage key
+        self._dirty: dict[str, StateRecord] = {}
+        # Records being written by the flush in progress
+        self._flushing: dict[str, StateRecord] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def _record(self, key: StorageKey) -> tuple[str, StateRecord]:
+        storage_key = self.key_builder.build(key)
+        record = self._dirty.get(storage_key) or self._flushing.get(storage_key)
+        if record is None and not self.shared:
+            record = self.cache.get(storage_key)
+        if record is None:
+            record = await self._load(storage_key)
+            if not self.shared:
+                self.cache.set(storage_key, record)
+        return storage_key, record
+
+    async def _load(self, storage_key: str) -> StateRecord:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(FSMState.state, FSMState.data, FSMState.updated_at).where(FSMState.key == storage_key)
+            )
+            row = result.first()
+        if row is None or row.updated_at < datetime.utcnow() - timedelta(seconds=self.state_ttl):
+            return StateRecord()
+        return StateRecord(row.state, pack_data(json.loads(row.data)) if row.data else {})
+
+    async def _changed(self, storage_key: str, record: StateRecord) -> None:
+        self._dirty[storage_key] = record
+        if self.shared:
+            # Other workers read the database, write through
+            await self.flush()
+        else:
+            self.cache.set(storage_key, record)
+            if len(self._dirty) >= self.flush_batch_size:
+                await self.flush()
+        if self._flusher is None:
+            # Also prunes expired conversations
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key, record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        await self._changed(storage_key, record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        storage_key, record = await self._record(key)
+        record.data = pack_data(data)
+        await self._changed(storage_key, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, record = await self._record(key)
+        return unpack_data(record.data)
+
+    async def flush(self) -> None:
+        """Write buffered changes: upsert active conversations, delete finished ones"""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            pending, self._dirty = self._dirty, {}
+            self._flushing = pending
+
+            now = datetime.utcnow()
+            rows = []
+            finished = []
+            for storage_key, record in pending.items():
+                if record.state is None and not record.data:
+                    finished.append(storage_key)
+                    continue
+                try:
+                    data = json.dumps(record.data, ensure_ascii=False, separators=(",", ":"), default=_encode)
+                except (TypeError, ValueError) as e:
+                    logger.error(f"FSM data for {storage_key} is not JSON serializable: {e}")
+                    continue
+                rows.append({"key": storage_key, "state": record.state, "data": data, "updated_at": now})
+
+            try:
+                async with self.session_factory() as session:
+                    if rows:
+                        stmt = dialect_insert(session, FSMState).values(rows)
+                        await session.execute(stmt.on_conflict_do_update(
+                            index_elements=["key"],
+                            set_={
+                                "state": stmt.excluded.state,
+                                "data": stmt.excluded.data,
+                                "updated_at": stmt.excluded.updated_at,
+                            }
+                        ))
+                    if finished:
+                        await session.execute(delete(FSMState).where(FSMState.key.in_(finished)))
+                    await session.commit()
+            except BaseException:
+                # Keep the changes for the next flush unless the key was written again meanwhile
+                for storage_key, record in pending.items():
+                    self._dirty.setdefault(storage_key, record)
+                raise
+            finally:
+                self._flushing = {}
+
+    async def prune(self) -> int:
+        """Delete conversations that were idle for longer than the TTL"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(FSMState).where(
+                    FSMState.updated_at < datetime.utcnow() - timedelta(seconds=self.state_ttl)
+                )
+            )
+            await session.commit()
+        return result.rowcount
+
+    def get_stats(self) -> dict:
+        """Memory used by cached states and the number of unsaved changes"""
+        return {**self.cache.stats(), "unsaved": len(self._dirty)}
+
+    async def _flush_periodically(self) -> None:
+        last_prune = None
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.cache.expire()
+            try:
+                await self.flush()
+                if last_prune is None or loop.time() - last_prune > FSM_PRUNE_SECONDS:
+                    removed = await self.prune()
+                    if removed:
+                        logger.info(f"Removed {removed} expired FSM states")
+                    last_prune = loop.time()
+            except Exception as e:
+                logger.error(f"Failed to save FSM states: {e}")
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+def _encode(value):
+    if isinstance(value, array):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
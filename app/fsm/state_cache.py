@@ -0,0 +1,121 @@
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Optional
+
+# Lists of ids are kept as packed 64-bit integers instead of Python int objects
+_PACKED_TYPECODE = "q"
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def pack_data(data: dict) -> dict:
+    """Replace lists of integers with packed arrays"""
+    return {key: _pack(value) for key, value in data.items()}
+
+
+def unpack_data(data: dict) -> dict:
+    """Copy of the data with packed arrays turned back into lists"""
+    return {key: value.tolist() if isinstance(value, array) else value for key, value in data.items()}
+
+
+def _pack(value: Any) -> Any:
+    if (
+        isinstance(value, list)
+        and value
+        and all(type(item) is int and _INT64_MIN <= item <= _INT64_MAX for item in value)
+    ):
+        return array(_PACKED_TYPECODE, value)
+    return value
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory used by a state value, in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class StateCache:
+    """
+    In-process FSM records with LRU eviction, bounded by idle time
+    and by an estimate of the memory they use
+    """
+
+    def __init__(self, max_bytes: int, idle_ttl: float):
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        # key -> [last access, size, record], least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        if now - entry[0] > self.idle_ttl:
+            self._remove(key)
+            self.expired += 1
+            self.misses += 1
+            return None
+
+        entry[0] = now
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, key: str, record) -> None:
+        """Store or re-measure a record after it changed"""
+        if key in self._entries:
+            self._remove(key)
+        size = estimate_size(key) + estimate_size(record.state) + estimate_size(record.data)
+        self._entries[key] = [time.monotonic(), size, record]
+        self.bytes += size
+        self.expire()
+        # Always keep the record that was just written
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evicted += 1
+
+    def expire(self) -> int:
+        """Drop records idle for longer than the TTL, oldest first"""
+        deadline = time.monotonic() - self.idle_ttl
+        removed = 0
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] >= deadline:
+                break
+            self._remove(key)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def _remove(self, key: str) -> Optional[list]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
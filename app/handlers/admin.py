@@ -1,14 +1,23 @@
 from aiogram import Router, F, types
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import insert, select
+import asyncio
 import csv
 import io
+import logging
+import tempfile
 
-from app.database.models import Word
+from app.database.db import async_session, get_pool_stats
+from app.middlewares.rate_limit import rate_limit_middleware
+from app.services.broadcast_service import latest_broadcast, Broadcast
+from app.services.import_service import WordImportService, build_error_report
+from app.services.reschedule_service import reschedule_all
+from app.services.scheduler import get_engine
 from app.services.stats_service import StatsService
+from app.services.word_catalog import word_catalog
 from app.keyboards.keyboards import main_menu_keyboard
 
 router = Router()
@@ -20,6 +29,9 @@ class AdminState(StatesGroup):
     waiting_for_csv = State()
     waiting_for_broadcast_message = State()
 
+# The running /reschedule job, kept so it isn't garbage collected
+_reschedule_task = None
+
 def is_admin(user_id: int) -> bool:
     """Check if the user is an admin"""
     return user_id in ADMIN_IDS
@@ -70,6 +82,78 @@ async def admin_stats(message: types.Message, session: AsyncSession):
     
     await message.answer(response, parse_mode="HTML")
 
+@router.message(Command("dbstats"))
+async def admin_db_stats(message: types.Message):
+    """Show database connection pool usage"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    stats = get_pool_stats()
+    response = "🗄 <b>Database Pool</b>\n\n"
+    for key, value in stats.items():
+        response += f"• {key}: {value}\n"
+    
+    await message.answer(response, parse_mode="HTML")
+
+@router.message(Command("apistats"))
+async def admin_api_stats(message: types.Message):
+    """Show how outgoing Telegram requests are being paced"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    stats = rate_limit_middleware.get_stats()
+    response = "📡 <b>Telegram API Queue</b>\n\n"
+    for key, value in stats.items():
+        response += f"• {key}: {value}\n"
+    
+    await message.answer(response, parse_mode="HTML")
+
+@router.message(Command("fsm_stats"))
+async def admin_fsm_stats(message: types.Message, fsm_storage: BaseStorage):
+    """Show how many conversation states are held in memory"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    if not hasattr(fsm_storage, "get_stats"):
+        await message.answer("The current FSM storage does not report statistics.")
+        return
+    
+    stats = fsm_storage.get_stats()
+    response = "🧠 <b>FSM State Cache</b>\n\n"
+    for key, value in stats.items():
+        if key.endswith("bytes"):
+            value = f"{value / 1024:.1f} KiB"
+        response += f"• {key}: {value}\n"
+    
+    await message.answer(response, parse_mode="HTML")
+
+@router.message(Command("reschedule"))
+async def admin_reschedule(message: types.Message):
+    """Recompute review dates of all words with the configured scheduler"""
+    global _reschedule_task
+    if not is_admin(message.from_user.id):
+        return
+    
+    if _reschedule_task is not None and not _reschedule_task.done():
+        await message.answer("Rescheduling is already running.")
+        return
+    
+    engine = get_engine()
+    progress = await message.answer(f"🗓 Rescheduling words with <b>{engine.name}</b>...", parse_mode="HTML")
+    
+    async def report(updated: int):
+        await progress.edit_text(f"🗓 Rescheduling words with <b>{engine.name}</b>: {updated} done", parse_mode="HTML")
+    
+    async def run():
+        try:
+            updated = await reschedule_all(engine, on_progress=report)
+            await progress.edit_text(f"✅ Rescheduled {updated} words with <b>{engine.name}</b>.", parse_mode="HTML")
+        except Exception as e:
+            logging.error(f"Rescheduling failed: {e}")
+            await progress.edit_text(f"❌ Rescheduling failed: {e}")
+    
+    _reschedule_task = asyncio.create_task(run())
+
 @router.message(F.text == "📝 Upload Words CSV")
 async def request_csv(message: types.Message, state: FSMContext):
     """Request CSV file with words"""
@@ -93,58 +177,49 @@ async def process_csv(message: types.Message, state: FSMContext, session: AsyncS
         await state.clear()
         return
     
-    # Download the file
+    # Download the file to disk in chunks instead of keeping it in memory
     file = await message.bot.get_file(message.document.file_id)
-    file_content = await message.bot.download_file(file.file_path)
     
     # Process CSV
+    importer = WordImportService(session)
     try:
-        csv_content = file_content.read().decode('utf-8')
-        csv_file = io.StringIO(csv_content)
-        csv_reader = csv.reader(csv_file)
+        try:
+            with tempfile.TemporaryFile() as raw_file:
+                await message.bot.download_file(file.file_path, destination=raw_file)
+                raw_file.seek(0)
+                
+                # Rows are parsed lazily while the import runs; bytes that aren't
+                # UTF-8 are replaced so only their rows are rejected
+                csv_file = io.TextIOWrapper(raw_file, encoding="utf-8-sig", errors="replace", newline="")
+                csv_reader = csv.reader(csv_file)
+                
+                # Skip header
+                next(csv_reader, None)
+                
+                report = await importer.import_rows(csv_reader)
+                csv_file.detach()
+        finally:
+            # Make the new words available to learning and quiz modes, including
+            # batches committed before a failure
+            if importer.report["added"]:
+                async with async_session() as catalog_session:
+                    await word_catalog.load(catalog_session)
         
-        # Skip header
-        next(csv_reader, None)
+        await message.answer(
+            f"CSV processed successfully. Added {report['added']} new words, "
+            f"skipped {report['duplicates']} existing words and "
+            f"{len(report['errors'])} invalid rows."
+        )
         
-        # Insert words
-        words_added = 0
-        for row in csv_reader:
-            if len(row) < 5:
-                continue  # Skip invalid rows
-            
-            word, translation, example, level, language = row[:5]
-            audio_url = row[5] if len(row) > 5 else None
-            
-            # Check if word already exists
-            result = await session.execute(
-                select(Word).where(
-                    Word.word == word,
-                    Word.language == language
-                )
+        if report["errors"]:
+            await message.answer_document(
+                types.BufferedInputFile(build_error_report(report["errors"]), filename="import_errors.csv"),
+                caption="Rows that were not imported"
             )
-            existing_word = result.scalars().first()
-            
-            if existing_word:
-                continue  # Skip existing words
-            
-            # Insert new word
-            await session.execute(
-                insert(Word).values(
-                    word=word,
-                    translation=translation,
-                    example=example,
-                    level=level,
-                    language=language,
-                    audio_url=audio_url
-                )
-            )
-            words_added += 1
-        
-        await session.commit()
-        
-        await message.answer(f"CSV processed successfully. Added {words_added} new words.")
     except Exception as e:
-        await message.answer(f"Error processing CSV: {str(e)}")
+        await message.answer(
+            f"Error processing CSV after adding {importer.report['added']} words: {str(e)}"
+        )
     
     await state.clear()
 
@@ -167,22 +242,35 @@ async def send_broadcast(message: types.Message, state: FSMContext, session: Asy
         await state.clear()
         return
     
-    # Get all users
-    result = await session.execute(select(Word.telegram_id))
-    user_ids = [row[0] for row in result.all()]
+    # Queue the message for every user; the outbox makes a restarted broadcast resume
+    broadcast = Broadcast(
+        message.bot,
+        campaign=f"broadcast:{message.chat.id}:{message.message_id}",
+        text=f"📣 <b>Announcement</b>\n\n{message.text}"
+    )
+    await broadcast.enqueue(session)
     
-    # Send message to all users
-    sent_count = 0
-    for user_id in user_ids:
-        try:
-            await message.bot.send_message(
-                user_id,
-                f"📣 <b>Announcement</b>\n\n{message.text}",
-                parse_mode="HTML"
-            )
-            sent_count += 1
-        except Exception:
-            continue
+    # Deliver in the background and keep the admin posted
+    progress_message = await message.answer(broadcast.progress_text(), parse_mode="HTML")
+    broadcast.start(progress_message)
+    await state.clear()
+
+@router.message(Command("broadcast_pause", "broadcast_resume", "broadcast_cancel", "broadcast_status"))
+async def control_broadcast(message: types.Message, command: CommandObject):
+    """Pause, resume, cancel or show the running broadcast"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    broadcast = latest_broadcast()
+    if not broadcast:
+        await message.answer("There is no broadcast running.")
+        return
+    
+    if command.command == "broadcast_pause":
+        await broadcast.pause()
+    elif command.command == "broadcast_resume":
+        await broadcast.resume()
+    elif command.command == "broadcast_cancel":
+        await broadcast.cancel()
     
-    await message.answer(f"Message sent to {sent_count} users.")
-    await state.clear() 
\ No newline at end of file
+    await message.answer(broadcast.progress_text(), parse_mode="HTML")
@@ -3,10 +3,14 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.keyboards.keyboards import word_card_keyboard, my_words_keyboard, main_menu_keyboard
-from app.services.user_service import UserService
+from app.keyboards.keyboards import (
+    word_card_keyboard, my_words_page_keyboard,
+    my_word_card_keyboard, main_menu_keyboard
+)
+from app.database.models import Settings, User
 from app.services.word_service import WordService
-from app.utils.helpers import format_word_card
+from app.services.word_list_service import WordListService
+from app.utils.helpers import format_word_card, format_word_list
 
 router = Router()
 
@@ -16,7 +20,9 @@ class LearningState(StatesGroup):
 
 # ---- New Words Mode ----
 
-async def get_new_word(message: types.Message, state: FSMContext, session: AsyncSession = None):
+async def get_new_word(
+    message: types.Message, state: FSMContext, session: AsyncSession = None, user: User = None, user_settings: Settings = None
+):
     """
     Get and display a new random word to the user.
     """
@@ -24,11 +30,8 @@ async def get_new_word(message: types.Message, state: FSMContext, session: Async
         # For when this function is called from other handlers
         return
     
-    # Get user information
-    user_service = UserService(session)
     word_service = WordService(session)
     
-    user = await user_service.get_user_by_telegram_id(message.from_user.id)
     if not user:
         await message.answer(
             "Please start the bot with /start to set up your profile first.",
@@ -36,11 +39,14 @@ async def get_new_word(message: types.Message, state: FSMContext, session: Async
         )
         return
     
-    # Get a random word
-    word = await word_service.get_random_word(user.language, user.level)
+    # Take the next word from today's prepared list
+    words_per_day = user_settings.words_per_day if user_settings else None
+    word, remaining = await word_service.get_new_word(user, words_per_day)
     if not word:
+        await state.clear()
         await message.answer(
-            "No words available for your current level. Please try again later or change your level in settings.",
+            "🎉 That's all the new words for today! Come back tomorrow, "
+            "or change how many words you get per day in settings.",
             reply_markup=main_menu_keyboard()
         )
         return
@@ -56,6 +62,7 @@ async def get_new_word(message: types.Message, state: FSMContext, session: Async
         example=word.example,
         audio_url=word.audio_url
     )
+    card_text += f"\n\n<i>New words left today: {remaining}</i>"
     
     await message.answer(
         card_text,
@@ -64,17 +71,21 @@ async def get_new_word(message: types.Message, state: FSMContext, session: Async
     )
 
 @router.callback_query(LearningState.viewing_new_word, F.data == "next_word")
-async def next_word(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def next_word(
+    callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User, user_settings: Settings
+):
     """
     Show next random word.
     """
     await callback.answer()
     
     # Get a new random word
-    await get_new_word(callback.message, state, session)
+    await get_new_word(callback.message, state, session, user, user_settings)
 
 @router.callback_query(LearningState.viewing_new_word, F.data == "add_word")
-async def add_word_to_user(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def add_word_to_user(
+    callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User, user_settings: Settings
+):
     """
     Add the current word to user's learning list.
     """
@@ -85,19 +96,15 @@ async def add_word_to_user(callback: types.CallbackQuery, state: FSMContext, ses
         await callback.answer("Word not found.")
         return
     
-    # Get user info
-    user_service = UserService(session)
     word_service = WordService(session)
     
-    user = await user_service.get_user_by_telegram_id(callback.from_user.id)
-    
     # Add word to user's list
     await word_service.add_word_to_user(user.id, current_word_id)
     
     await callback.answer("Word added to your learning list!")
     
     # Show next word
-    await get_new_word(callback.message, state, session)
+    await get_new_word(callback.message, state, session, user, user_settings)
 
 @router.callback_query(LearningState.viewing_new_word, F.data == "back_to_menu")
 async def back_to_menu_from_learning(callback: types.CallbackQuery, state: FSMContext):
@@ -114,19 +121,14 @@ async def back_to_menu_from_learning(callback: types.CallbackQuery, state: FSMCo
     
 # ---- My Words Mode ----
 
-async def get_user_words(message: types.Message, state: FSMContext, session: AsyncSession = None):
+async def get_user_words(message: types.Message, state: FSMContext, session: AsyncSession = None, user: User = None):
     """
-    Show the user's saved words.
+    Show the first page of the user's saved words.
     """
     if not session:
         # For when this function is called from other handlers
         return
     
-    # Get user information
-    user_service = UserService(session)
-    word_service = WordService(session)
-    
-    user = await user_service.get_user_by_telegram_id(message.from_user.id)
     if not user:
         await message.answer(
             "Please start the bot with /start to set up your profile first.",
@@ -134,9 +136,9 @@ async def get_user_words(message: types.Message, state: FSMContext, session: Asy
         )
         return
     
-    # Get user's words
-    user_words = await word_service.get_user_words(user.id)
-    if not user_words:
+    word_list_service = WordListService(session)
+    page = await word_list_service.get_page(user.id)
+    if not page.entries:
         await message.answer(
             "You haven't added any words to your learning list yet. "
             "Go to 'Learn New Words' to add some!",
@@ -144,160 +146,138 @@ async def get_user_words(message: types.Message, state: FSMContext, session: Asy
         )
         return
     
-    # Get the first word
-    user_word, word = user_words[0]
-    
-    # Store data in state
-    await state.update_data(
-        user_words_ids=[uw.id for uw, _ in user_words],
-        word_ids=[w.id for _, w in user_words],
-        current_index=0
-    )
+    # Only the position in the list is kept in state
+    await state.update_data(words_cursor=page.cursor)
     await state.set_state(LearningState.viewing_user_word)
     
-    # Display the word card
-    card_text = format_word_card(
-        word=word.word,
-        translation=word.translation,
-        example=word.example,
-        audio_url=word.audio_url
+    await message.answer(
+        format_word_list(page.entries),
+        parse_mode="HTML",
+        reply_markup=my_words_page_keyboard(page.entries, False, page.has_next)
     )
+    word_list_service.prefetch_next(page)
+
+async def show_words_page(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User, cursor: int):
+    """
+    Show the page of saved words that starts after the cursor.
+    """
+    word_list_service = WordListService(session)
+    page = await word_list_service.get_page(user.id, cursor)
     
-    # Add review information
-    card_text += f"\n\n📊 <b>Stats:</b>\n"
-    card_text += f"• Reviews: {user_word.review_count}\n"
-    card_text += f"• Correct answers: {user_word.correct_count}\n"
+    # The page may be empty after the last word on it was removed
+    if not page.entries and cursor > 0:
+        cursor = await word_list_service.get_previous_cursor(user.id, cursor)
+        page = await word_list_service.get_page(user.id, cursor)
     
-    await message.answer(
-        card_text,
+    if not page.entries:
+        await state.clear()
+        await callback.message.edit_text(
+            "You've removed all words from your learning list. "
+            "Go to 'Learn New Words' to add some more!",
+            reply_markup=None
+        )
+        await callback.message.answer(
+            "Returning to main menu.",
+            reply_markup=main_menu_keyboard()
+        )
+        return
+    
+    await state.update_data(words_cursor=page.cursor)
+    
+    await callback.message.edit_text(
+        format_word_list(page.entries),
         parse_mode="HTML",
-        reply_markup=my_words_keyboard()
+        reply_markup=my_words_page_keyboard(page.entries, page.cursor > 0, page.has_next)
     )
+    word_list_service.prefetch_next(page)
 
-@router.callback_query(LearningState.viewing_user_word, F.data == "next_my_word")
-async def next_my_word(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+@router.callback_query(LearningState.viewing_user_word, F.data == "my_words_next")
+async def next_words_page(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """
-    Show next word from user's list.
+    Show the next page of the user's words.
     """
     await callback.answer()
     
-    # Get data from state
     data = await state.get_data()
-    user_words_ids = data.get("user_words_ids", [])
-    word_ids = data.get("word_ids", [])
-    current_index = data.get("current_index", 0)
+    page = await WordListService(session).get_page(user.id, data.get("words_cursor", 0))
+    await show_words_page(callback, state, session, user, page.next_cursor)
+
+@router.callback_query(LearningState.viewing_user_word, F.data == "my_words_prev")
+async def previous_words_page(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
+    """
+    Show the previous page of the user's words.
+    """
+    await callback.answer()
     
-    # Move to next word
-    next_index = (current_index + 1) % len(user_words_ids) if user_words_ids else 0
+    data = await state.get_data()
+    cursor = await WordListService(session).get_previous_cursor(user.id, data.get("words_cursor", 0))
+    await show_words_page(callback, state, session, user, cursor)
+
+@router.callback_query(LearningState.viewing_user_word, F.data == "my_words_page")
+async def current_words_page(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
+    """
+    Return from a word card to the list.
+    """
+    await callback.answer()
     
-    # Update state
-    await state.update_data(current_index=next_index)
+    data = await state.get_data()
+    await show_words_page(callback, state, session, user, data.get("words_cursor", 0))
+
+@router.callback_query(LearningState.viewing_user_word, F.data.startswith("my_word_"))
+async def show_my_word(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
+    """
+    Show the card of a word from the user's list.
+    """
+    user_word_id = int(callback.data.split("_")[-1])
+    data = await state.get_data()
     
-    # Get the word data
-    word_service = WordService(session)
-    user_word = await session.get("UserWord", user_words_ids[next_index])
-    word = await session.get("Word", word_ids[next_index])
+    entry = await WordListService(session).get_entry(user.id, user_word_id, data.get("words_cursor"))
+    if not entry:
+        await callback.answer("Word not found.")
+        return
+    
+    await callback.answer()
     
     # Display the word card
     card_text = format_word_card(
-        word=word.word,
-        translation=word.translation,
-        example=word.example,
-        audio_url=word.audio_url
+        word=entry.word,
+        translation=entry.translation,
+        example=entry.example,
+        audio_url=entry.audio_url
     )
     
     # Add review information
-    card_text += f"\n\n📊 <b>Stats:</b>\n"
-    card_text += f"• Reviews: {user_word.review_count}\n"
-    card_text += f"• Correct answers: {user_word.correct_count}\n"
+    card_text += "\n\n📊 <b>Stats:</b>\n"
+    card_text += f"• Reviews: {entry.review_count}\n"
+    card_text += f"• Correct answers: {entry.correct_count}\n"
     
     await callback.message.edit_text(
         card_text,
         parse_mode="HTML",
-        reply_markup=my_words_keyboard()
+        reply_markup=my_word_card_keyboard(entry.user_word_id)
     )
 
-@router.callback_query(LearningState.viewing_user_word, F.data == "remove_word")
-async def remove_my_word(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+@router.callback_query(LearningState.viewing_user_word, F.data.startswith("remove_word_"))
+async def remove_my_word(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """
-    Remove current word from user's learning list.
+    Remove a word from user's learning list and return to the list.
     """
-    # Get data from state
+    user_word_id = int(callback.data.split("_")[-1])
     data = await state.get_data()
-    user_words_ids = data.get("user_words_ids", [])
-    word_ids = data.get("word_ids", [])
-    current_index = data.get("current_index", 0)
+    cursor = data.get("words_cursor", 0)
     
-    if not user_words_ids or current_index >= len(user_words_ids):
+    entry = await WordListService(session).get_entry(user.id, user_word_id, cursor)
+    if not entry:
         await callback.answer("Word not found.")
         return
     
-    # Get user and word IDs
-    user_service = UserService(session)
-    word_service = WordService(session)
-    
-    user = await user_service.get_user_by_telegram_id(callback.from_user.id)
-    word_id = word_ids[current_index]
-    
     # Remove word
-    await word_service.remove_word_from_user(user.id, word_id)
-    
-    # Remove from lists
-    user_words_ids.pop(current_index)
-    word_ids.pop(current_index)
-    
-    # If no words left
-    if not user_words_ids:
-        await callback.answer("Word removed. No more words in your list.")
-        await state.clear()
-        
-        await callback.message.edit_text(
-            "You've removed all words from your learning list. "
-            "Go to 'Learn New Words' to add some more!",
-            reply_markup=None
-        )
-        
-        await callback.message.answer(
-            "Returning to main menu.",
-            reply_markup=main_menu_keyboard()
-        )
-        return
-    
-    # Update index if needed
-    if current_index >= len(user_words_ids):
-        current_index = 0
-    
-    # Update state
-    await state.update_data(
-        user_words_ids=user_words_ids,
-        word_ids=word_ids,
-        current_index=current_index
-    )
+    word_service = WordService(session)
+    await word_service.remove_word_from_user(user.id, entry.word_id)
     
     await callback.answer("Word removed from your learning list.")
     
-    # Show next word
-    user_word = await session.get("UserWord", user_words_ids[current_index])
-    word = await session.get("Word", word_ids[current_index])
-    
-    # Display the word card
-    card_text = format_word_card(
-        word=word.word,
-        translation=word.translation,
-        example=word.example,
-        audio_url=word.audio_url
-    )
-    
-    # Add review information
-    card_text += f"\n\n📊 <b>Stats:</b>\n"
-    card_text += f"• Reviews: {user_word.review_count}\n"
-    card_text += f"• Correct answers: {user_word.correct_count}\n"
-    
-    await callback.message.edit_text(
-        card_text,
-        parse_mode="HTML",
-        reply_markup=my_words_keyboard()
-    )
+    await show_words_page(callback, state, session, user, cursor)
 
 @router.callback_query(LearningState.viewing_user_word, F.data == "back_to_menu")
 async def back_to_menu_from_my_words(callback: types.CallbackQuery, state: FSMContext):
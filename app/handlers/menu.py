@@ -8,7 +8,7 @@ from app.keyboards.keyboards import (
     training_options_keyboard,
     settings_keyboard
 )
-from app.services.user_service import UserService
+from app.database.models import Settings, User
 from app.services.stats_service import StatsService
 from app.utils.helpers import format_user_stats
 
@@ -26,7 +26,9 @@ async def back_to_menu(message: types.Message, state: FSMContext):
     )
 
 @router.message(F.text == "📚 Learn New Words")
-async def learn_new_words(message: types.Message, state: FSMContext):
+async def learn_new_words(
+    message: types.Message, state: FSMContext, session: AsyncSession, user: User, user_settings: Settings
+):
     """
     Handler for starting the learn new words mode.
     """
@@ -39,7 +41,7 @@ async def learn_new_words(message: types.Message, state: FSMContext):
     
     # Let the learning handler take over
     from app.handlers.learning import get_new_word
-    await get_new_word(message, state)
+    await get_new_word(message, state, session, user, user_settings)
 
 @router.message(F.text == "🔄 Training")
 async def start_training(message: types.Message, state: FSMContext):
@@ -52,7 +54,7 @@ async def start_training(message: types.Message, state: FSMContext):
     )
 
 @router.message(F.text == "📋 My Words")
-async def my_words(message: types.Message, state: FSMContext):
+async def my_words(message: types.Message, state: FSMContext, session: AsyncSession, user: User):
     """
     Handler for viewing saved words.
     """
@@ -65,15 +67,22 @@ async def my_words(message: types.Message, state: FSMContext):
     
     # Let the learning handler take over
     from app.handlers.learning import get_user_words
-    await get_user_words(message, state)
+    await get_user_words(message, state, session, user)
 
 @router.message(F.text == "📊 My Progress")
-async def show_progress(message: types.Message, session: AsyncSession):
+async def show_progress(message: types.Message, session: AsyncSession, user: User):
     """
     Handler for showing user progress and statistics.
     """
+    if not user:
+        await message.answer(
+            "Please start the bot with /start to set up your profile first.",
+            reply_markup=types.ReplyKeyboardRemove()
+        )
+        return
+    
     stats_service = StatsService(session)
-    user_stats = await stats_service.get_user_stats(message.from_user.id)
+    user_stats = await stats_service.get_user_stats(user.id)
     
     formatted_stats = format_user_stats(user_stats)
     
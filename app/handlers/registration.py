@@ -5,6 +5,7 @@ from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.keyboards.keyboards import language_keyboard, level_keyboard, main_menu_keyboard
+from app.database.models import User
 from app.services.user_service import UserService
 from app.database.db import get_session
 
@@ -16,13 +17,10 @@ class RegistrationForm(StatesGroup):
     level = State()
 
 @router.message(CommandStart())
-async def cmd_start(message: types.Message, state: FSMContext, session: AsyncSession):
+async def cmd_start(message: types.Message, state: FSMContext, user: User):
     """
     Handler for the /start command. Checks if the user exists, if not, starts registration.
     """
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(message.from_user.id)
-    
     if user:
         # User already exists
         await message.answer(
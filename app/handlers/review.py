@@ -2,13 +2,13 @@ from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
-import random
 
-from app.keyboards.keyboards import main_menu_keyboard, quiz_answer_keyboard
-from app.services.user_service import UserService
+from app.keyboards.keyboards import main_menu_keyboard, quiz_answer_keyboard, review_continue_keyboard
+from app.database.models import User
+from app.services.review_buffer import REVIEW_MODE
+from app.services.review_service import REVIEW_COUNT_CAP, REVIEW_SESSION_SIZE, ReviewPlan, ReviewService
 from app.services.word_service import WordService
-from app.services.notification_service import NotificationService
-from app.utils.helpers import generate_options, format_word_card
+from app.utils.helpers import answer_latency_ms
 
 router = Router()
 
@@ -17,14 +17,10 @@ class ReviewState(StatesGroup):
     answering = State()
 
 @router.callback_query(F.data == "review_now")
-async def start_review(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def start_review(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """Start reviewing words that are due for review"""
     await callback.answer()
     
-    # Get user
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(callback.from_user.id)
-    
     if not user:
         await callback.message.answer(
             "Please start the bot with /start to set up your profile first.",
@@ -32,98 +28,84 @@ async def start_review(callback: types.CallbackQuery, state: FSMContext, session
         )
         return
     
-    # Get words due for review
-    notification_service = NotificationService(session, callback.bot)
-    review_words = await notification_service.get_words_due_for_review(user.id)
+    # Load the due words and prepare every question up front
+    review_service = ReviewService(session)
+    plan = await review_service.build_plan(user.id)
     
-    if not review_words:
+    if not plan:
         await callback.message.answer(
             "You don't have any words to review at the moment.",
             reply_markup=main_menu_keyboard()
         )
         return
     
-    # Prepare for review
-    await callback.message.answer(
-        f"Let's review {len(review_words)} words that are due today! 🔍\n"
-        f"I'll show you the words and ask for translations."
-    )
+    # Prepare for review; only a full session can leave words for later
+    due_count = await review_service.count_due(user.id) if len(plan) >= REVIEW_SESSION_SIZE else len(plan)
+    if due_count > len(plan):
+        intro = f"Let's review the {len(plan)} most urgent of your {format_due_count(due_count)} due words! 🔍\n"
+    else:
+        intro = f"Let's review {len(plan)} words that are due today! 🔍\n"
+    await callback.message.answer(intro + "I'll show you the words and ask for translations.")
     
-    # Store review data in state
-    await state.update_data(
-        review_words=[(uw.id, w.id) for uw, w in review_words],
-        current_index=0
-    )
+    # The plan is a few id lists, which the FSM storage packs
+    await state.set_data({**plan.to_state(), "current_index": 0})
+    await state.set_state(ReviewState.answering)
     
     # Show first review
-    await show_next_review(callback.message, state, session)
+    await show_next_review(callback.message, state, session, user)
 
-async def show_next_review(message, state: FSMContext, session: AsyncSession):
+async def show_next_review(message, state: FSMContext, session: AsyncSession, user: User):
     """Show the next word for review"""
-    # Get data from state
     data = await state.get_data()
-    review_words = data.get("review_words", [])
-    current_index = data.get("current_index", 0)
+    review_service = ReviewService(session)
+    question = await review_service.get_question(ReviewPlan.from_state(data), data.get("current_index", 0))
     
-    # Check if we've reviewed all words
-    if current_index >= len(review_words):
-        await message.answer(
-            "🎉 Congratulations! You've completed all your reviews for today.",
-            reply_markup=main_menu_keyboard()
-        )
+    # Check if we've reviewed all words in this session
+    if question is None:
         await state.clear()
+        remaining = await review_service.count_due(user.id)
+        if remaining:
+            await message.answer(
+                f"✅ Session complete! You still have {format_due_count(remaining)} words due.",
+                reply_markup=review_continue_keyboard(format_due_count(remaining))
+            )
+        else:
+            await message.answer(
+                "🎉 Congratulations! You've completed all your reviews for today.",
+                reply_markup=main_menu_keyboard()
+            )
         return
     
-    # Get the current word
-    user_word_id, word_id = review_words[current_index]
-    word = await session.get("Word", word_id)
-    
-    # Get some random words for quiz options
-    word_service = WordService(session)
-    other_words = await word_service.get_random_words_for_quiz(
-        word.language, word.level, 3
-    )
-    
-    # Generate quiz options
-    options, correct_index = generate_options(word, other_words)
-    
-    # Store quiz data in state
-    await state.update_data(
-        current_word_id=word_id,
-        current_user_word_id=user_word_id,
-        correct_index=correct_index
-    )
-    await state.set_state(ReviewState.answering)
-    
     # Display the quiz
     await message.answer(
-        f"Translate the word:\n\n<b>{word.word}</b>",
+        f"Translate the word:\n\n<b>{question.word.word}</b>",
         parse_mode="HTML",
-        reply_markup=quiz_answer_keyboard(options)
+        reply_markup=quiz_answer_keyboard(question.options)
     )
 
 @router.callback_query(ReviewState.answering, F.data.startswith("answer_"))
-async def process_review_answer(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def process_review_answer(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """Process the user's answer to a review question"""
     # Get the selected answer index
     selected_index = int(callback.data.split("_")[1])
     
-    # Get saved data
+    # The question is rebuilt from the plan in state, no lookups needed
     data = await state.get_data()
-    correct_index = data.get("correct_index")
-    word_id = data.get("current_word_id")
-    user_word_id = data.get("current_user_word_id")
     current_index = data.get("current_index", 0)
+    question = await ReviewService(session).get_question(ReviewPlan.from_state(data), current_index)
+    if question is None:
+        await callback.answer()
+        return
     
     # Check the answer
-    is_correct = selected_index == correct_index
-    
-    # Get the word for feedback
-    word = await session.get("Word", word_id)
+    is_correct = selected_index == question.correct_index
+    word = question.word
     
     # Update stats
     word_service = WordService(session)
-    await word_service.update_review_status(user_word_id, is_correct)
+    await word_service.update_review_status(
+        question.user_word_id, is_correct, user.id, word.id, REVIEW_MODE, answer_latency_ms(callback.message.date)
+    )
     
     # Prepare feedback message
     if is_correct:
@@ -141,8 +123,11 @@ async def process_review_answer(callback: types.CallbackQuery, state: FSMContext
     )
     
     # Move to the next word
-    await state.update_data(current_index=current_index + 1)
+    await state.update_data(current_index=question.index + 1)
     
     # Continue with next word
     await callback.message.answer("Moving to the next word...")
-    await show_next_review(callback.message, state, session) 
\ No newline at end of file
+    await show_next_review(callback.message, state, session, user)
+
+def format_due_count(count: int) -> str:
+    return f"{count}+" if count >= REVIEW_COUNT_CAP else str(count)
\ No newline at end of file
@@ -8,7 +8,9 @@ from app.keyboards.keyboards import (
     main_menu_keyboard, words_per_day_keyboard,
     yes_no_keyboard
 )
+from app.database.models import User, Settings
 from app.services.user_service import UserService
+from app.services.daily_queue_service import DailyQueueService
 from app.services.word_service import WordService
 
 router = Router()
@@ -32,18 +34,15 @@ async def change_language(message: types.Message, state: FSMContext):
     await state.set_state(SettingsState.language_change)
 
 @router.message(SettingsState.language_change, F.text.in_(["🇬🇧 English", "🇩🇪 German"]))
-async def process_language_change(message: types.Message, state: FSMContext, session: AsyncSession):
+async def process_language_change(message: types.Message, state: FSMContext, session: AsyncSession, user: User):
     """
     Process language change selection.
     """
     language = "english" if message.text == "🇬🇧 English" else "german"
     
     # Update user language
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(message.from_user.id)
-    
     if user:
-        await user_service.update_user_language(user.id, language)
+        await UserService(session).update_user_language(user.id, language)
         
         await message.answer(
             f"Your learning language has been updated to {language}!",
@@ -69,7 +68,7 @@ async def change_words_per_day(message: types.Message, state: FSMContext):
     await state.set_state(SettingsState.words_per_day)
 
 @router.callback_query(SettingsState.words_per_day, F.data.startswith("words_per_day_"))
-async def process_words_per_day(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def process_words_per_day(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """
     Process words per day selection.
     """
@@ -79,11 +78,10 @@ async def process_words_per_day(callback: types.CallbackQuery, state: FSMContext
     words_count = int(callback.data.split("_")[-1])
     
     # Update user settings
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(callback.from_user.id)
-    
     if user:
-        await user_service.update_settings(user.id, words_per_day=words_count)
+        await UserService(session).update_settings(user.id, words_per_day=words_count)
+        # Rebuild today's new words with the new count on the next tap
+        await DailyQueueService(session).discard(user.id)
         
         await callback.message.edit_text(
             f"Your daily word count has been updated to {words_count} words per day!"
@@ -101,14 +99,10 @@ async def process_words_per_day(callback: types.CallbackQuery, state: FSMContext
         await state.clear()
 
 @router.message(F.text == "🔔 Toggle Notifications")
-async def toggle_notifications(message: types.Message, state: FSMContext, session: AsyncSession):
+async def toggle_notifications(message: types.Message, state: FSMContext, user: User, user_settings: Settings):
     """
     Handler for toggling notifications.
     """
-    # Get current notification status
-    user_service = UserService(session)
-    user = await user_service.get_user_by_telegram_id(message.from_user.id)
-    
     if not user:
         await message.answer(
             "User not found. Please restart with /start.",
@@ -116,11 +110,9 @@ async def toggle_notifications(message: types.Message, state: FSMContext, sessio
         )
         return
     
-    settings = await user_service.get_user_settings(user.id)
-    current_status = settings.notify
+    # Get current notification status
+    current_status = user_settings.notify
     
-    # Store user ID in state
-    await state.update_data(user_id=user.id)
     await state.set_state(SettingsState.notifications)
     
     await message.answer(
@@ -130,7 +122,9 @@ async def toggle_notifications(message: types.Message, state: FSMContext, sessio
     )
 
 @router.callback_query(SettingsState.notifications, F.data.startswith("confirm_"))
-async def process_notification_toggle(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def process_notification_toggle(
+    callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User, user_settings: Settings
+):
     """
     Process notification toggle selection.
     """
@@ -140,18 +134,9 @@ async def process_notification_toggle(callback: types.CallbackQuery, state: FSMC
     answer = callback.data.split("_")[1]
     
     if answer == "yes":
-        # Get user ID from state
-        data = await state.get_data()
-        user_id = data.get("user_id")
-        
-        # Get current status
-        user_service = UserService(session)
-        settings = await user_service.get_user_settings(user_id)
-        current_status = settings.notify
-        
         # Toggle notification status
-        new_status = not current_status
-        await user_service.update_settings(user_id, notify=new_status)
+        new_status = not user_settings.notify
+        await UserService(session).update_settings(user.id, notify=new_status)
         
         await callback.message.edit_text(
             f"Notifications have been turned {'ON' if new_status else 'OFF'}!"
@@ -183,7 +168,7 @@ async def reset_progress(message: types.Message, state: FSMContext):
     await state.set_state(SettingsState.reset_confirm)
 
 @router.callback_query(SettingsState.reset_confirm, F.data.startswith("confirm_"))
-async def process_reset_confirm(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def process_reset_confirm(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """
     Process reset progress confirmation.
     """
@@ -193,17 +178,9 @@ async def process_reset_confirm(callback: types.CallbackQuery, state: FSMContext
     answer = callback.data.split("_")[1]
     
     if answer == "yes":
-        # Delete all user words
-        user_service = UserService(session)
-        word_service = WordService(session)
-        
-        user = await user_service.get_user_by_telegram_id(callback.from_user.id)
+        # Delete all user words and review history
         if user:
-            # Delete all UserWord records for this user
-            await session.execute(
-                f"DELETE FROM user_words WHERE user_id = {user.id}"
-            )
-            await session.commit()
+            await WordService(session).reset_progress(user.id)
             
             await callback.message.edit_text(
                 "Your progress has been reset. All words and statistics have been cleared."
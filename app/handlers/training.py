@@ -3,11 +3,13 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 import random
+from datetime import datetime, timezone
 
 from app.keyboards.keyboards import main_menu_keyboard, quiz_answer_keyboard
-from app.services.user_service import UserService
+from app.database.models import User
+from app.services.review_buffer import FILL_IN_BLANK_MODE, QUIZ_MODE
 from app.services.word_service import WordService
-from app.utils.helpers import generate_options, generate_fill_in_blank
+from app.utils.helpers import answer_latency_ms, generate_options, generate_fill_in_blank
 
 router = Router()
 
@@ -16,15 +18,12 @@ class TrainingState(StatesGroup):
     fill_in_blank = State()
 
 @router.message(F.text == "🔤 Translation Quiz")
-async def start_translation_quiz(message: types.Message, state: FSMContext, session: AsyncSession):
+async def start_translation_quiz(message: types.Message, state: FSMContext, session: AsyncSession, user: User):
     """
     Start translation quiz training.
     """
-    # Get user information
-    user_service = UserService(session)
     word_service = WordService(session)
     
-    user = await user_service.get_user_by_telegram_id(message.from_user.id)
     if not user:
         await message.answer(
             "Please start the bot with /start to set up your profile first.",
@@ -35,11 +34,13 @@ async def start_translation_quiz(message: types.Message, state: FSMContext, sess
     # Get user's words or random words if user doesn't have enough
     user_words = await word_service.get_user_words(user.id)
     if user_words and len(user_words) >= 4:
-        # Use user's own words for the quiz
+        # Quiz one of the user's own words against look-alike translations
         random.shuffle(user_words)
         correct_pair = user_words[0]
-        other_words = [word for _, word in user_words[1:]]
         correct_word_obj = correct_pair[1]
+        other_words = await word_service.get_distractors(correct_word_obj.id)
+        if len(other_words) < 3:
+            other_words = [word for _, word in user_words[1:]]
         
         # Use the user_word_id for tracking later
         user_word_id = correct_pair[0].id
@@ -79,7 +80,7 @@ async def start_translation_quiz(message: types.Message, state: FSMContext, sess
     )
 
 @router.callback_query(TrainingState.quiz, F.data.startswith("answer_"))
-async def process_quiz_answer(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def process_quiz_answer(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """
     Process the user's answer to a quiz question.
     """
@@ -102,7 +103,9 @@ async def process_quiz_answer(callback: types.CallbackQuery, state: FSMContext,
     # Update stats if the word is from user's list
     if user_word_id and source == "user_words":
         word_service = WordService(session)
-        await word_service.update_review_status(user_word_id, is_correct)
+        await word_service.update_review_status(
+            user_word_id, is_correct, user.id, correct_word_id, QUIZ_MODE, answer_latency_ms(callback.message.date)
+        )
     
     # Prepare feedback message
     if is_correct:
@@ -131,25 +134,22 @@ async def process_quiz_answer(callback: types.CallbackQuery, state: FSMContext,
     )
 
 @router.callback_query(F.data == "quiz_continue")
-async def continue_quiz(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def continue_quiz(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """
     Continue with another quiz question.
     """
     await callback.answer()
     
     # Start a new quiz question
-    await start_translation_quiz(callback.message, state, session)
+    await start_translation_quiz(callback.message, state, session, user)
 
 @router.message(F.text == "📝 Fill in the Blank")
-async def start_fill_in_blank(message: types.Message, state: FSMContext, session: AsyncSession):
+async def start_fill_in_blank(message: types.Message, state: FSMContext, session: AsyncSession, user: User):
     """
     Start fill in the blank training.
     """
-    # Get user information
-    user_service = UserService(session)
     word_service = WordService(session)
     
-    user = await user_service.get_user_by_telegram_id(message.from_user.id)
     if not user:
         await message.answer(
             "Please start the bot with /start to set up your profile first.",
@@ -190,7 +190,8 @@ async def start_fill_in_blank(message: types.Message, state: FSMContext, session
         answer=answer,
         correct_word_id=correct_word_obj.id,
         user_word_id=user_word_id,
-        source=source
+        source=source,
+        asked_at=message.date.timestamp()
     )
     await state.set_state(TrainingState.fill_in_blank)
     
@@ -201,7 +202,7 @@ async def start_fill_in_blank(message: types.Message, state: FSMContext, session
     )
 
 @router.message(TrainingState.fill_in_blank)
-async def process_fill_in_blank(message: types.Message, state: FSMContext, session: AsyncSession):
+async def process_fill_in_blank(message: types.Message, state: FSMContext, session: AsyncSession, user: User):
     """
     Process the user's answer to a fill in the blank exercise.
     """
@@ -227,7 +228,11 @@ async def process_fill_in_blank(message: types.Message, state: FSMContext, sessi
     # Update stats if the word is from user's list
     if user_word_id and source == "user_words":
         word_service = WordService(session)
-        await word_service.update_review_status(user_word_id, is_correct)
+        asked_at = data.get("asked_at")
+        latency_ms = answer_latency_ms(datetime.fromtimestamp(asked_at, timezone.utc), message.date) if asked_at else None
+        await word_service.update_review_status(
+            user_word_id, is_correct, user.id, correct_word_id, FILL_IN_BLANK_MODE, latency_ms
+        )
     
     # Prepare feedback message
     if is_correct:
@@ -256,14 +261,14 @@ async def process_fill_in_blank(message: types.Message, state: FSMContext, sessi
     )
 
 @router.callback_query(F.data == "fill_continue")
-async def continue_fill(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
+async def continue_fill(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, user: User):
     """
     Continue with another fill in the blank exercise.
     """
     await callback.answer()
     
     # Start a new exercise
-    await start_fill_in_blank(callback.message, state, session)
+    await start_fill_in_blank(callback.message, state, session, user)
 
 @router.callback_query(F.data == "back_to_menu")
 async def back_to_menu(callback: types.CallbackQuery, state: FSMContext):
@@ -30,14 +30,26 @@ def word_card_keyboard() -> InlineKeyboardMarkup:
     )
     return keyboard
 
-def my_words_keyboard() -> InlineKeyboardMarkup:
-    keyboard = InlineKeyboardMarkup(row_width=1)
-    keyboard.add(
-        InlineKeyboardButton("❌ Remove Word", callback_data="remove_word"),
-        InlineKeyboardButton("⏭️ Next Word", callback_data="next_my_word"),
-        InlineKeyboardButton("🔙 Back to Menu", callback_data="back_to_menu")
-    )
-    return keyboard
+def my_words_page_keyboard(entries, has_prev: bool, has_next: bool) -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(text=f"🔍 {entry.word}", callback_data=f"my_word_{entry.user_word_id}")]
+        for entry in entries
+    ]
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="⬅️ Previous", callback_data="my_words_prev"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="Next ➡️", callback_data="my_words_next"))
+    if navigation:
+        rows.append(navigation)
+    rows.append([InlineKeyboardButton(text="🔙 Back to Menu", callback_data="back_to_menu")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def my_word_card_keyboard(user_word_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="❌ Remove Word", callback_data=f"remove_word_{user_word_id}")],
+        [InlineKeyboardButton(text="📋 Back to List", callback_data="my_words_page")]
+    ])
 
 # Training keyboards
 def training_options_keyboard() -> ReplyKeyboardMarkup:
@@ -79,6 +91,12 @@ def yes_no_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 # Review keyboard
+def review_continue_keyboard(remaining: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"🔁 Continue Reviewing ({remaining} left)", callback_data="review_now")],
+        [InlineKeyboardButton(text="🔙 Back to Menu", callback_data="back_to_menu")]
+    ])
+
 def review_now_keyboard() -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardMarkup()
     keyboard.add(InlineKeyboardButton("📝 Review Now", callback_data="review_now"))
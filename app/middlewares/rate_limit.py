@@ -0,0 +1,96 @@
+import logging
+import os
+import random
+import time
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.utils.rate_limiter import TelegramRateLimiter, telegram_limiter
+
+logger = logging.getLogger(__name__)
+
+# How many times a request is repeated after Telegram answers with retry_after
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+
+# API methods that count against the flood limits
+LIMITED_METHOD_PREFIXES = ("send", "copy", "forward", "edit")
+UNLIMITED_METHODS = {"sendChatAction"}
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Paces outgoing Bot API calls through the global and per-chat token buckets.
+    Requests over the limit wait in line instead of failing, and flood control
+    errors are retried after the time Telegram asks for.
+    """
+
+    def __init__(self, limiter: TelegramRateLimiter = telegram_limiter, max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.metrics = {
+            "requests": 0,
+            "waiting": 0,
+            "max_waiting": 0,
+            "delayed": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+            "retry_after": 0,
+        }
+
+    async def __call__(self, make_request, bot, method):
+        api_method = getattr(method, "__api_method__", "")
+        if not api_method.startswith(LIMITED_METHOD_PREFIXES) or api_method in UNLIMITED_METHODS:
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, "chat_id", None)
+        if not isinstance(chat_id, int):
+            # Usernames and inline messages only count against the global limit
+            chat_id = None
+
+        attempt = 0
+        while True:
+            await self._wait(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.metrics["retry_after"] += 1
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Flood control on {api_method}, retrying in {e.retry_after}s")
+                # Flood control applies to the whole bot; jitter keeps waiters from retrying at once
+                self.limiter.pause(e.retry_after + random.uniform(0, 1))
+
+    async def _wait(self, chat_id) -> None:
+        metrics = self.metrics
+        metrics["requests"] += 1
+        metrics["waiting"] += 1
+        metrics["max_waiting"] = max(metrics["max_waiting"], metrics["waiting"])
+        started = time.monotonic()
+        try:
+            await self.limiter.acquire(chat_id)
+        finally:
+            metrics["waiting"] -= 1
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            metrics["delayed"] += 1
+            metrics["total_wait"] += waited
+            metrics["max_wait"] = max(metrics["max_wait"], waited)
+
+    def get_stats(self) -> dict:
+        """Current queue depth and how long requests waited for the limiter"""
+        metrics = self.metrics
+        delayed = metrics["delayed"]
+        return {
+            "requests": metrics["requests"],
+            "queue_depth": metrics["waiting"],
+            "max_queue_depth": metrics["max_waiting"],
+            "delayed": delayed,
+            "avg_wait_ms": round(metrics["total_wait"] / delayed * 1000, 1) if delayed else 0.0,
+            "max_wait_ms": round(metrics["max_wait"] * 1000, 1),
+            "retry_after": metrics["retry_after"],
+        }
+
+
+rate_limit_middleware = RateLimitMiddleware()
@@ -0,0 +1,15 @@
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from app.database.db import release_connection
+
+
+class ReleaseConnectionMiddleware(BaseRequestMiddleware):
+    """
+    Ends the running update's read-only transaction before each Bot API call,
+    so a pool connection isn't held while the request waits for the rate
+    limiter and Telegram. Must be registered before the rate limit middleware.
+    """
+
+    async def __call__(self, make_request, bot, method):
+        await release_connection()
+        return await make_request(bot, method)
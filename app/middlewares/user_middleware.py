@@ -0,0 +1,30 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.services.user_service import UserService
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Resolves the sender's User and Settings once per update and passes them
+    to handlers as `user` and `user_settings` (None for unregistered users).
+    Must run after the middleware that provides `session`.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user, settings = None, None
+        from_user = data.get("event_from_user")
+        session = data.get("session")
+        if from_user is not None and session is not None:
+            user, settings = await UserService(session).get_user_context(from_user.id)
+
+        data["user"] = user
+        data["user_settings"] = settings
+        return await handler(event, data)
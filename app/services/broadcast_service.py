@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.db import async_session
+from app.database.models import User
+from app.services.fanout import BLOCKED, FAILED, SENT, FanOutEngine, OutgoingMessage
+from app.services.outbox_service import CANCELLED, PAUSED, PENDING, SENDING, OutboxService, OutboxWorker
+
+logger = logging.getLogger(__name__)
+
+# Recipients read and queued per round-trip
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", "500"))
+# How often the admin's progress message is refreshed
+BROADCAST_PROGRESS_SECONDS = float(os.getenv("BROADCAST_PROGRESS_SECONDS", "5"))
+
+RUNNING = "running"
+FINISHED = "finished"
+
+# Broadcasts started by this process, by campaign
+active_broadcasts: dict[str, "Broadcast"] = {}
+
+
+class Broadcast:
+    """One announcement being delivered to all users, controllable by the admin"""
+
+    def __init__(self, bot, campaign: str, text: str):
+        self.bot = bot
+        self.campaign = campaign
+        self.text = text
+        self.state = RUNNING
+        self.total = 0
+        self.started_at = time.monotonic()
+        self.engine = FanOutEngine(bot)
+        # Per-status message counts read from the outbox, workers of other processes included
+        self.counts: dict[str, int] = {}
+        self.progress_message = None
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def enqueue(self, session: AsyncSession) -> int:
+        """
+        Queue the message for every user, streaming recipients from the users table.
+        Rows are stored paused so no other worker sends them before start().
+        """
+        result = await session.stream_scalars(
+            select(User.telegram_id).execution_options(yield_per=BROADCAST_BATCH_SIZE)
+        )
+        # Outbox commits would close the cursor, so they go through a separate session
+        async with async_session() as outbox_session:
+            outbox = OutboxService(outbox_session)
+            async for chunk in result.partitions(BROADCAST_BATCH_SIZE):
+                await outbox.enqueue(self.campaign, [
+                    (f"{self.campaign}:{telegram_id}", OutgoingMessage(telegram_id, self.text))
+                    for telegram_id in chunk
+                ], status=PAUSED)
+            self.counts = await outbox.campaign_counts(self.campaign)
+            self.total = sum(self.counts.values())
+        return self.total
+
+    def start(self, progress_message) -> None:
+        self.progress_message = progress_message
+        active_broadcasts[self.campaign] = self
+        self._task = asyncio.create_task(self._run())
+
+    async def pause(self) -> None:
+        if self.state != RUNNING:
+            return
+        # Update the rows first so other workers stop picking them up
+        async with async_session() as session:
+            await OutboxService(session).pause(self.campaign)
+        self.state = PAUSED
+        self._resumed.clear()
+
+    async def resume(self) -> None:
+        if self.state != PAUSED:
+            return
+        async with async_session() as session:
+            await OutboxService(session).resume(self.campaign)
+        self.state = RUNNING
+        self._resumed.set()
+
+    async def cancel(self) -> None:
+        if self.state in (CANCELLED, FINISHED):
+            return
+        async with async_session() as session:
+            await OutboxService(session).cancel(self.campaign)
+        self.state = CANCELLED
+        self._resumed.set()
+
+    def _stop(self) -> Optional[str]:
+        """Status for claimed but unsent messages when the admin paused or cancelled"""
+        if self.state in (PAUSED, CANCELLED):
+            return self.state
+        return None
+
+    async def _run(self) -> None:
+        progress = asyncio.create_task(self._report_progress())
+        try:
+            if self.state == RUNNING:
+                # Release the rows enqueue() held back, now that other workers exclude this campaign
+                async with async_session() as session:
+                    await OutboxService(session).resume(self.campaign)
+            while True:
+                await OutboxWorker(self.bot).drain(self.campaign, engine=self.engine, stop=self._stop)
+                if self.state == PAUSED:
+                    await self._resumed.wait()
+                    continue
+                if self.state == RUNNING and await self._has_unsent():
+                    # Failed messages waiting for their retry, or claimed by another worker
+                    await asyncio.sleep(BROADCAST_PROGRESS_SECONDS)
+                    continue
+                break
+            if self.state == RUNNING:
+                self.state = FINISHED
+        except Exception as e:
+            logger.error(f"Broadcast {self.campaign} stopped with an error: {e}")
+        finally:
+            progress.cancel()
+            await self._update_progress()
+            active_broadcasts.pop(self.campaign, None)
+            logger.info(f"Broadcast {self.campaign} {self.state}: {self.counts}")
+
+    async def _has_unsent(self) -> bool:
+        await self._refresh_counts()
+        return bool(self.counts.get(PENDING, 0) + self.counts.get(SENDING, 0))
+
+    async def _refresh_counts(self) -> None:
+        async with async_session() as session:
+            self.counts = await OutboxService(session).campaign_counts(self.campaign)
+
+    async def _report_progress(self) -> None:
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_SECONDS)
+            await self._update_progress()
+
+    async def _update_progress(self) -> None:
+        if self.progress_message is None:
+            return
+        try:
+            await self._refresh_counts()
+            await self.progress_message.edit_text(self.progress_text(), parse_mode="HTML")
+        except TelegramBadRequest:
+            # Nothing changed since the last update
+            pass
+        except Exception as e:
+            logger.warning(f"Failed to update broadcast progress: {e}")
+
+    def progress_text(self) -> str:
+        counts = self.counts
+        done = counts.get(SENT, 0) + counts.get(BLOCKED, 0) + counts.get(FAILED, 0)
+        elapsed = int(time.monotonic() - self.started_at)
+        text = (
+            f"📣 <b>Broadcast {self.state}</b>\n\n"
+            f"Progress: {done} / {self.total}\n"
+            f"✅ Sent: {counts.get(SENT, 0)}\n"
+            f"🚫 Blocked the bot: {counts.get(BLOCKED, 0)}\n"
+            f"❌ Failed: {counts.get(FAILED, 0)}\n"
+            f"⏳ Rate limited: {self.engine.summary['throttled']} times\n"
+            f"⏱ Elapsed: {elapsed // 60}m {elapsed % 60}s"
+        )
+        if self.state == RUNNING:
+            text += "\n\n/broadcast_pause · /broadcast_cancel"
+        elif self.state == PAUSED:
+            text += "\n\n/broadcast_resume · /broadcast_cancel"
+        return text
+
+
+def latest_broadcast() -> Optional[Broadcast]:
+    """The most recently started broadcast that is still active"""
+    if not active_broadcasts:
+        return None
+    return next(reversed(active_broadcasts.values()))
+
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.db import async_session, commit, dialect_insert
+from app.database.models import DailyWordQueue, ReviewEvent, Settings, User, UserWord
+from app.services.known_words import KnownWordSet, get_known_words
+from app.services.word_catalog import CatalogWord, word_catalog
+
+logger = logging.getLogger(__name__)
+
+# UTC hour at which the next day's queues are built
+DAILY_QUEUE_HOUR = int(os.getenv("DAILY_QUEUE_HOUR", "3"))
+# Users seen within this many days get a queue prepared; others get one on their first tap
+DAILY_QUEUE_ACTIVE_DAYS = int(os.getenv("DAILY_QUEUE_ACTIVE_DAYS", "14"))
+DAILY_QUEUE_BATCH_SIZE = int(os.getenv("DAILY_QUEUE_BATCH_SIZE", "500"))
+DEFAULT_WORDS_PER_DAY = 5
+
+
+def pick_new_words(known: KnownWordSet, language: str, level: str, count: int) -> list[int]:
+    """Up to `count` distinct random words of the level that are not in `known`, which is updated"""
+    word_ids = []
+    while len(word_ids) < count:
+        word = word_catalog.random_unknown_word(language, level, known)
+        if word is None:
+            break
+        known.add(word.id)
+        word_ids.append(word.id)
+    return word_ids
+
+
+def queue_row(user_id: int, day: date, language: str, level: str, word_ids: list[int]) -> dict:
+    return {
+        "user_id": user_id,
+        "day": day,
+        "language": language,
+        "level": level,
+        "word_ids": json.dumps(word_ids),
+        "size": len(word_ids),
+        "position": 0,
+    }
+
+
+class DailyQueueService:
+    """Per-user lists of the day's new words, sized by Settings.words_per_day"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def pop_word(self, user: User, words_per_day: int = None) -> tuple[Optional[CatalogWord], int]:
+        """
+        The next of today's new words and how many are left after it.
+        (None, 0) means today's words are used up.
+        """
+        today = datetime.utcnow().date()
+        known = await get_known_words(self.session, user.id)
+        built = False
+        while True:
+            # Take the next slot atomically, a double tap can't show the same word twice
+            result = await self.session.execute(
+                update(DailyWordQueue)
+                .where(
+                    DailyWordQueue.user_id == user.id,
+                    DailyWordQueue.day == today,
+                    DailyWordQueue.language == user.language,
+                    DailyWordQueue.level == user.level,
+                    DailyWordQueue.position < DailyWordQueue.size,
+                )
+                .values(position=DailyWordQueue.position + 1)
+                .returning(DailyWordQueue.word_ids, DailyWordQueue.position, DailyWordQueue.size)
+                .execution_options(synchronize_session=False)
+            )
+            row = result.first()
+            await commit(self.session)
+            if row is None:
+                # Either today's words are used up or there is no queue for today yet
+                if built or await self._has_queue(user, today):
+                    return None, 0
+                await self.build_for_user(user, words_per_day)
+                built = True
+                continue
+
+            word_ids = json.loads(row.word_ids)
+            word_id = word_ids[row.position - 1]
+            word = word_catalog.get(word_id)
+            if word is not None and word_id not in known:
+                return word, row.size - row.position
+
+            # The word was saved since the queue was built, or removed from the
+            # catalog; fill the slot with another one so the day keeps its count
+            word = await self._replacement(user, known, word_ids)
+            if word is not None:
+                word_ids[row.position - 1] = word.id
+                await self.session.execute(
+                    update(DailyWordQueue)
+                    .where(DailyWordQueue.user_id == user.id)
+                    .values(word_ids=json.dumps(word_ids))
+                    .execution_options(synchronize_session=False)
+                )
+                await commit(self.session)
+                return word, row.size - row.position
+
+    async def _replacement(self, user: User, known: KnownWordSet, word_ids: list[int]) -> Optional[CatalogWord]:
+        """A random unknown word of the user's level that isn't in the queue yet"""
+        await word_catalog.ensure_loaded(self.session)
+        taken = known.copy()
+        for word_id in word_ids:
+            taken.add(word_id)
+        return word_catalog.random_unknown_word(user.language, user.level, taken)
+
+    async def _has_queue(self, user: User, day: date) -> bool:
+        result = await self.session.execute(
+            select(DailyWordQueue.user_id).where(
+                DailyWordQueue.user_id == user.id,
+                DailyWordQueue.day == day,
+                DailyWordQueue.language == user.language,
+                DailyWordQueue.level == user.level,
+            )
+        )
+        return result.first() is not None
+
+    async def build_for_user(self, user: User, words_per_day: int = None) -> None:
+        """Prepare today's queue for one user, when the nightly job didn't"""
+        await word_catalog.ensure_loaded(self.session)
+        if words_per_day is None:
+            settings = await self.session.get(Settings, user.id)
+            words_per_day = settings.words_per_day if settings else DEFAULT_WORDS_PER_DAY
+
+        known = (await get_known_words(self.session, user.id)).copy()
+        word_ids = pick_new_words(known, user.language, user.level, words_per_day)
+        await self._save([queue_row(user.id, datetime.utcnow().date(), user.language, user.level, word_ids)])
+
+    async def build_all(self, day: date = None, batch_size: int = DAILY_QUEUE_BATCH_SIZE) -> int:
+        """Prepare `day`'s queues for every recently active user, returns how many were built"""
+        day = day or datetime.utcnow().date()
+        await word_catalog.ensure_loaded(self.session)
+        active_since = datetime.utcnow() - timedelta(days=DAILY_QUEUE_ACTIVE_DAYS)
+
+        built = 0
+        cursor = 0
+        while True:
+            result = await self.session.execute(
+                select(User.id, User.language, User.level, Settings.words_per_day)
+                .outerjoin(Settings, Settings.user_id == User.id)
+                .where(
+                    User.id > cursor,
+                    or_(
+                        User.date_joined >= active_since,
+                        select(UserWord.id).where(
+                            UserWord.user_id == User.id, UserWord.added_date >= active_since
+                        ).exists(),
+                        select(ReviewEvent.id).where(
+                            ReviewEvent.user_id == User.id, ReviewEvent.ts >= active_since
+                        ).exists(),
+                    )
+                )
+                .order_by(User.id)
+                .limit(batch_size)
+            )
+            users = result.all()
+            if not users:
+                break
+            cursor = users[-1].id
+
+            # Saved words of the whole batch in one query
+            known = {user.id: KnownWordSet() for user in users}
+            result = await self.session.execute(
+                select(UserWord.user_id, UserWord.word_id).where(UserWord.user_id.in_(list(known)))
+            )
+            for user_id, word_id in result.all():
+                known[user_id].add(word_id)
+
+            rows = [
+                queue_row(
+                    user.id, day, user.language, user.level,
+                    pick_new_words(
+                        known[user.id], user.language, user.level,
+                        user.words_per_day if user.words_per_day is not None else DEFAULT_WORDS_PER_DAY
+                    )
+                )
+                for user in users
+            ]
+            await self._save(rows)
+            built += len(rows)
+            # Let updates in between batches
+            await asyncio.sleep(0)
+
+        return built
+
+    async def discard(self, user_id: int) -> None:
+        """Drop the user's queue so it is rebuilt with their new settings"""
+        await self.session.execute(delete(DailyWordQueue).where(DailyWordQueue.user_id == user_id))
+        await commit(self.session)
+
+    async def _save(self, rows: list[dict]) -> None:
+        stmt = dialect_insert(self.session, DailyWordQueue).values(rows)
+        await self.session.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "day": stmt.excluded.day,
+                "language": stmt.excluded.language,
+                "level": stmt.excluded.level,
+                "word_ids": stmt.excluded.word_ids,
+                "size": stmt.excluded.size,
+                "position": stmt.excluded.position,
+            }
+        ))
+        await commit(self.session)
+
+
+async def build_daily_queues_nightly() -> None:
+    """Build the coming day's queues every night at DAILY_QUEUE_HOUR (UTC)"""
+    while True:
+        now = datetime.utcnow()
+        next_run = now.replace(hour=DAILY_QUEUE_HOUR, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+
+        try:
+            async with async_session() as session:
+                built = await DailyQueueService(session).build_all(next_run.date())
+            logger.info(f"Built {built} daily new-word queues")
+        except Exception as e:
+            logger.error(f"Error building daily new-word queues: {e}")
@@ -0,0 +1,150 @@
+import os
+import zlib
+from typing import Optional
+
+import numpy as np
+
+# Nearest neighbours kept per word; quiz options are sampled from them
+DISTRACTOR_NEIGHBOURS = int(os.getenv("DISTRACTOR_NEIGHBOURS", "8"))
+# Translations whose lengths differ by more than this rank below all others
+DISTRACTOR_LENGTH_BAND = int(os.getenv("DISTRACTOR_LENGTH_BAND", "3"))
+
+NGRAM_SIZE = 3
+# Character n-grams are hashed into this many features
+NGRAM_FEATURES = 1024
+# Rows compared against the whole bucket at once, bounds memory to CHUNK x bucket size
+CHUNK_ROWS = 1024
+OUT_OF_BAND_PENALTY = 2.0
+
+
+def ngram_vectors(translations: list[str]) -> np.ndarray:
+    """Unit-length hashed character n-gram counts, one row per translation"""
+    vectors = np.zeros((len(translations), NGRAM_FEATURES), dtype=np.float32)
+    for row, translation in enumerate(translations):
+        text = f" {translation.lower()} "
+        for start in range(max(len(text) - NGRAM_SIZE + 1, 1)):
+            feature = zlib.crc32(text[start:start + NGRAM_SIZE].encode()) % NGRAM_FEATURES
+            vectors[row, feature] += 1
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+
+def translation_codes(translations: list[str]) -> np.ndarray:
+    """The same integer for translations that are equal ignoring case"""
+    codes = {}
+    return np.fromiter(
+        (codes.setdefault(text.lower(), len(codes)) for text in translations),
+        dtype=np.int32, count=len(translations)
+    )
+
+
+class DistractorIndex:
+    """
+    For every word of a catalog bucket, the bucket positions of the words whose
+    translations look most alike, as a words x K matrix (-1 where fewer exist)
+    """
+
+    __slots__ = ("neighbours", "scores", "translations")
+
+    def __init__(self, neighbours: np.ndarray, scores: np.ndarray, translations: list):
+        self.neighbours = neighbours
+        self.scores = scores
+        # Tells whether a reloaded bucket only had words appended
+        self.translations = translations
+
+    def __len__(self) -> int:
+        return len(self.neighbours)
+
+    def lookup(self, position: int) -> np.ndarray:
+        if position >= len(self.neighbours):
+            return self.neighbours[:0, 0]
+        row = self.neighbours[position]
+        return row[row >= 0]
+
+    @classmethod
+    def build(cls, translations: list[str], k: int = DISTRACTOR_NEIGHBOURS) -> "DistractorIndex":
+        empty = cls(np.full((0, k), -1, dtype=np.int32), np.zeros((0, k), dtype=np.float32), [])
+        return empty.extend(translations)
+
+    def extend(self, translations: list[str]) -> "DistractorIndex":
+        """
+        Index with `translations` appended to the bucket. Only the new words are
+        compared with everything; old words just consider the new ones as neighbours.
+        """
+        if not translations:
+            return self
+        k = self.neighbours.shape[1]
+        old_count = len(self)
+        all_translations = self.translations + list(translations)
+        # Vectors are recomputed rather than kept, they would cost 4 KB per word
+        vectors = ngram_vectors(all_translations)
+        lengths = np.fromiter((len(text) for text in all_translations), dtype=np.int16, count=len(all_translations))
+        codes = translation_codes(all_translations)
+        new_positions = np.arange(old_count, len(all_translations))
+
+        new_neighbours, new_scores = [], []
+        for start in range(old_count, len(all_translations), CHUNK_ROWS):
+            rows = slice(start, start + CHUNK_ROWS)
+            similarity = self._similarity(vectors[rows], lengths[rows], vectors, lengths)
+            # A word is never its own distractor, nor a word with the same translation
+            similarity[codes[rows][:, None] == codes[None, :]] = -np.inf
+            neighbours, scores = _top_k(similarity, k)
+            new_neighbours.append(neighbours)
+            new_scores.append(scores)
+
+        neighbours = self.neighbours
+        scores = self.scores
+        if old_count:
+            # Old words may now have closer neighbours among the new ones
+            neighbours, scores = neighbours.copy(), scores.copy()
+            for start in range(0, old_count, CHUNK_ROWS):
+                rows = slice(start, min(start + CHUNK_ROWS, old_count))
+                similarity = self._similarity(vectors[rows], lengths[rows], vectors[old_count:], lengths[old_count:])
+                similarity[codes[rows][:, None] == codes[old_count:][None, :]] = -np.inf
+                candidates = np.hstack([neighbours[rows], np.broadcast_to(new_positions, similarity.shape)])
+                candidate_scores = np.hstack([np.where(neighbours[rows] >= 0, scores[rows], -np.inf), similarity])
+                order = np.argsort(-candidate_scores, axis=1, kind="stable")[:, :k]
+                best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+                neighbours[rows] = np.where(np.isfinite(best_scores), np.take_along_axis(candidates, order, axis=1), -1)
+                scores[rows] = np.where(np.isfinite(best_scores), best_scores, 0)
+
+        return DistractorIndex(
+            np.vstack([neighbours, *new_neighbours]).astype(np.int32),
+            np.vstack([scores, *new_scores]).astype(np.float32),
+            all_translations,
+        )
+
+    @staticmethod
+    def _similarity(vectors, lengths, other_vectors, other_lengths) -> np.ndarray:
+        similarity = vectors @ other_vectors.T
+        # In place, these are chunk x bucket sized
+        out_of_band = np.abs(lengths[:, None] - other_lengths[None, :]) > DISTRACTOR_LENGTH_BAND
+        np.subtract(similarity, OUT_OF_BAND_PENALTY, out=similarity, where=out_of_band)
+        return similarity
+
+
+def _top_k(similarity: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Column indices and scores of each row's k best finite scores, best first"""
+    width = similarity.shape[1]
+    take = min(k, width)
+    if take == 0:
+        return np.full((len(similarity), k), -1, dtype=np.int32), np.zeros((len(similarity), k), dtype=np.float32)
+    best = np.argpartition(-similarity, take - 1, axis=1)[:, :take]
+    best_scores = np.take_along_axis(similarity, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+    neighbours = np.full((len(similarity), k), -1, dtype=np.int32)
+    scores = np.zeros((len(similarity), k), dtype=np.float32)
+    valid = np.isfinite(best_scores)
+    neighbours[:, :take] = np.where(valid, best, -1)
+    scores[:, :take] = np.where(valid, best_scores, 0)
+    return neighbours, scores
+
+
+def build_or_extend(index: Optional[DistractorIndex], translations: list[str]) -> DistractorIndex:
+    """Index for a bucket's translations, reusing `index` when they only had words appended"""
+    if index is not None and translations[:len(index)] == index.translations:
+        return index.extend(translations[len(index):])
+    return DistractorIndex.build(translations)
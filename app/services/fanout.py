@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import random
+from typing import Any, AsyncIterable, Awaitable, Callable, NamedTuple, Optional
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+logger = logging.getLogger(__name__)
+
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "20"))
+FANOUT_MAX_RETRIES = int(os.getenv("FANOUT_MAX_RETRIES", "3"))
+
+# Delivery outcomes
+SENT = "sent"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+class OutgoingMessage(NamedTuple):
+    chat_id: int
+    text: str
+    reply_markup: Any = None
+    parse_mode: str = "HTML"
+    # Caller-defined identifier passed back to on_result
+    key: Any = None
+
+
+class FanOutEngine:
+    """
+    Sends many messages with bounded concurrency.
+    Pacing to Telegram's limits is done by the bot session's RateLimitMiddleware.
+    """
+
+    def __init__(
+        self,
+        bot,
+        concurrency: int = FANOUT_CONCURRENCY,
+        max_retries: int = FANOUT_MAX_RETRIES,
+    ):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.summary = {SENT: 0, FAILED: 0, BLOCKED: 0, "throttled": 0}
+
+    async def send(self, message: OutgoingMessage, stop: Optional[Callable[[], Any]] = None) -> Optional[str]:
+        """
+        Deliver one message, retrying on flood control and transient errors.
+        Returns None if stop() became truthy before the message went out.
+        """
+        attempt = 0
+        while True:
+            if stop is not None and stop():
+                return None
+            try:
+                await self.bot.send_message(
+                    message.chat_id,
+                    message.text,
+                    parse_mode=message.parse_mode,
+                    reply_markup=message.reply_markup
+                )
+                return SENT
+            except TelegramRetryAfter as e:
+                # The session middleware already retried and paused the limiter
+                self.summary["throttled"] += 1
+                delay = e.retry_after + random.uniform(0, 1)
+            except TelegramForbiddenError:
+                # The user blocked the bot or deleted their account
+                return BLOCKED
+            except TelegramBadRequest as e:
+                logger.warning(f"Failed to send message to {message.chat_id}: {e}")
+                return FAILED
+            except (TelegramNetworkError, TelegramServerError) as e:
+                delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                logger.warning(f"Temporary error sending to {message.chat_id}: {e}")
+
+            attempt += 1
+            if attempt > self.max_retries:
+                return FAILED
+            await asyncio.sleep(delay)
+
+    async def run(
+        self,
+        messages: AsyncIterable[OutgoingMessage],
+        on_result: Optional[Callable[[OutgoingMessage, str], Awaitable[None]]] = None,
+        stop: Optional[Callable[[], Any]] = None,
+    ) -> dict:
+        """
+        Send every message from the iterable and return delivery counts.
+        Once stop() returns a truthy value, queued messages are skipped
+        without calling on_result.
+        """
+        # A small queue keeps the producer from reading far ahead of the senders
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                message = await queue.get()
+                try:
+                    if message is None:
+                        return
+                    try:
+                        outcome = await self.send(message, stop)
+                    except Exception as e:
+                        logger.error(f"Unexpected error sending to {message.chat_id}: {e}")
+                        outcome = FAILED
+                    if outcome is None:
+                        continue
+                    self.summary[outcome] += 1
+                    if on_result is not None:
+                        try:
+                            await on_result(message, outcome)
+                        except Exception as e:
+                            logger.error(f"Failed to record delivery to {message.chat_id}: {e}")
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            async for message in messages:
+                await queue.put(message)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        return dict(self.summary)
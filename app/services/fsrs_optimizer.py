@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.db import async_session, dialect_insert
+from app.database.models import ReviewEvent, UserSchedulerParams
+from app.services.scheduler import (
+    FSRS_DEFAULT_WEIGHTS, CardState, FSRSScheduler, fsrs_retrievability
+)
+
+logger = logging.getLogger(__name__)
+
+# Users need this many logged answers before their weights are fitted
+FSRS_OPTIMIZER_MIN_REVIEWS = int(os.getenv("FSRS_OPTIMIZER_MIN_REVIEWS", "200"))
+# Users fitted per round, their events are loaded together
+FSRS_OPTIMIZER_BATCH_USERS = int(os.getenv("FSRS_OPTIMIZER_BATCH_USERS", "20"))
+FSRS_OPTIMIZER_WORKERS = int(os.getenv("FSRS_OPTIMIZER_WORKERS", "2"))
+FSRS_OPTIMIZER_INTERVAL_SECONDS = int(os.getenv("FSRS_OPTIMIZER_INTERVAL_SECONDS", "86400"))
+
+# Only each word's first answers are replayed, later ones add little
+MAX_ANSWERS_PER_WORD = 64
+FIT_ITERATIONS = 60
+FIT_LEARNING_RATE = 0.05
+# Pull towards the default weights, so short histories can't drift far
+FIT_REGULARIZATION = 0.01
+FSRS_WEIGHT_BOUNDS = (
+    (0.1, 100), (0.1, 100), (0.1, 100), (0.1, 100), (1, 10), (0.1, 5), (0.1, 5), (0, 0.5), (0, 3),
+    (0.1, 0.8), (0.01, 2.5), (0.5, 5), (0.01, 0.2), (0.01, 0.9), (0.01, 2), (0, 1), (1, 10),
+)
+
+
+class ReviewHistory(NamedTuple):
+    """One user's answers as words x answers matrices, small enough to send to a worker process"""
+    user_id: int
+    last_event_id: int
+    reviews: int
+    elapsed_days: np.ndarray
+    correct: np.ndarray
+    mask: np.ndarray
+
+
+def build_history(user_id: int, events: list) -> ReviewHistory:
+    """Turn (id, word_id, ts, correct) rows, ordered by word and time, into matrices"""
+    by_word = {}
+    for event in events:
+        by_word.setdefault(event.word_id, []).append(event)
+
+    width = min(max(len(answers) for answers in by_word.values()), MAX_ANSWERS_PER_WORD)
+    elapsed = np.zeros((len(by_word), width))
+    correct = np.zeros((len(by_word), width), dtype=bool)
+    mask = np.zeros((len(by_word), width), dtype=bool)
+    for row, answers in enumerate(by_word.values()):
+        previous = None
+        for column, event in enumerate(answers[:width]):
+            if previous is not None:
+                elapsed[row, column] = (event.ts - previous).total_seconds() / 86400
+            correct[row, column] = event.correct
+            mask[row, column] = True
+            previous = event.ts
+
+    return ReviewHistory(
+        user_id, max(event.id for event in events), len(events), elapsed, correct, mask
+    )
+
+
+def history_loss(weights: np.ndarray, history: ReviewHistory) -> float:
+    """Mean log loss of FSRS recall predictions for every answer after a word's first"""
+    engine = FSRSScheduler(weights)
+    cards = CardState.new_batch(history.mask.shape[0])
+    total, predictions = 0.0, 0
+    for column in range(history.mask.shape[1]):
+        active = history.mask[:, column]
+        seen = active & (cards.stability > 0)
+        if seen.any():
+            recall = fsrs_retrievability(history.elapsed_days[seen, column], cards.stability[seen])
+            recall = np.clip(recall, 1e-4, 1 - 1e-4)
+            outcome = history.correct[seen, column]
+            total -= np.sum(np.where(outcome, np.log(recall), np.log(1 - recall)))
+            predictions += int(seen.sum())
+
+        reviewed, _ = engine.review_batch(cards, history.correct[:, column], history.elapsed_days[:, column])
+        cards = CardState(*(np.where(active, new, old) for new, old in zip(reviewed, cards)))
+
+    return total / predictions if predictions else 0.0
+
+
+def fit_weights(history: ReviewHistory) -> tuple[int, list, float]:
+    """
+    Fit FSRS weights to one user's history with Adam on finite-difference
+    gradients. Runs in a worker process; returns (user_id, weights, loss),
+    the default weights when fitting didn't improve on them.
+    """
+    defaults = np.asarray(FSRS_DEFAULT_WEIGHTS, dtype=float)
+    lower, upper = np.array(FSRS_WEIGHT_BOUNDS, dtype=float).T
+
+    def objective(weights: np.ndarray) -> float:
+        penalty = FIT_REGULARIZATION * np.sum(((weights - defaults) / (upper - lower)) ** 2)
+        return history_loss(weights, history) + penalty
+
+    weights = defaults.copy()
+    best_weights, best_loss = defaults.copy(), objective(defaults)
+    moment, velocity = np.zeros_like(weights), np.zeros_like(weights)
+    steps = (upper - lower) * 1e-3
+    for iteration in range(1, FIT_ITERATIONS + 1):
+        gradient = np.zeros_like(weights)
+        for i in range(len(weights)):
+            shift = np.zeros_like(weights)
+            shift[i] = steps[i]
+            gradient[i] = (objective(weights + shift) - objective(weights - shift)) / (2 * steps[i])
+
+        moment = 0.9 * moment + 0.1 * gradient
+        velocity = 0.999 * velocity + 0.001 * gradient ** 2
+        update = (moment / (1 - 0.9 ** iteration)) / (np.sqrt(velocity / (1 - 0.999 ** iteration)) + 1e-8)
+        # Steps are scaled to each weight's range
+        weights = np.clip(weights - FIT_LEARNING_RATE * update * (upper - lower) / 10, lower, upper)
+
+        loss = objective(weights)
+        if loss < best_loss:
+            best_weights, best_loss = weights.copy(), loss
+
+    return history.user_id, [round(float(weight), 4) for weight in best_weights], float(best_loss)
+
+
+async def load_user_weights(session: AsyncSession, user_ids) -> dict[int, tuple]:
+    """Personal FSRS weights of the given users that have them"""
+    result = await session.execute(
+        select(UserSchedulerParams.user_id, UserSchedulerParams.weights)
+        .where(UserSchedulerParams.user_id.in_(set(user_ids)))
+    )
+    return {row.user_id: tuple(json.loads(row.weights)) for row in result.all()}
+
+
+class FSRSOptimizer:
+    """Refits personal FSRS weights for users with new review history, in worker processes"""
+
+    def __init__(self, workers: int = FSRS_OPTIMIZER_WORKERS, batch_users: int = FSRS_OPTIMIZER_BATCH_USERS):
+        self.workers = workers
+        self.batch_users = batch_users
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def stale_users(self, session: AsyncSession) -> list[int]:
+        """
+        Users with enough answers whose newest answer is newer than their last
+        fit, in one pass over review_events
+        """
+        events = (
+            select(
+                ReviewEvent.user_id,
+                func.count().label("reviews"),
+                func.max(ReviewEvent.id).label("last_event_id"),
+            )
+            .group_by(ReviewEvent.user_id)
+            .having(func.count() >= FSRS_OPTIMIZER_MIN_REVIEWS)
+            .subquery()
+        )
+        result = await session.execute(
+            select(events.c.user_id)
+            .outerjoin(UserSchedulerParams, UserSchedulerParams.user_id == events.c.user_id)
+            .where(
+                (UserSchedulerParams.user_id.is_(None))
+                | (UserSchedulerParams.last_event_id < events.c.last_event_id)
+            )
+            .order_by(events.c.user_id)
+        )
+        return result.scalars().all()
+
+    async def load_histories(self, session: AsyncSession, user_ids: list[int]) -> list[ReviewHistory]:
+        result = await session.execute(
+            select(ReviewEvent.id, ReviewEvent.user_id, ReviewEvent.word_id, ReviewEvent.ts, ReviewEvent.correct)
+            .where(ReviewEvent.user_id.in_(user_ids))
+            .order_by(ReviewEvent.user_id, ReviewEvent.word_id, ReviewEvent.ts)
+        )
+        by_user = {}
+        for event in result.all():
+            by_user.setdefault(event.user_id, []).append(event)
+        return [build_history(user_id, events) for user_id, events in by_user.items()]
+
+    async def run_once(self) -> int:
+        """Fit every user whose history changed, returns how many were fitted"""
+        loop = asyncio.get_running_loop()
+        if self._pool is None:
+            # Forking a process that runs an event loop and other threads can copy held locks
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        async with async_session() as session:
+            stale = await self.stale_users(session)
+
+        fitted = 0
+        for start in range(0, len(stale), self.batch_users):
+            user_ids = stale[start:start + self.batch_users]
+            async with async_session() as session:
+                histories = await self.load_histories(session, user_ids)
+
+            # Fitting is CPU-bound, keep it off the event loop
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._pool, fit_weights, history) for history in histories),
+                return_exceptions=True
+            )
+
+            rows = []
+            now = datetime.utcnow()
+            for history, result in zip(histories, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to fit FSRS weights for user {history.user_id}: {result}")
+                    continue
+                _, weights, loss = result
+                rows.append({
+                    "user_id": history.user_id,
+                    "weights": json.dumps(weights),
+                    "last_event_id": history.last_event_id,
+                    "reviews": history.reviews,
+                    "loss": loss,
+                    "fitted_at": now,
+                })
+            if rows:
+                await self._save(rows)
+                fitted += len(rows)
+
+        return fitted
+
+    async def _save(self, rows: list[dict]) -> None:
+        async with async_session() as session:
+            stmt = dialect_insert(session, UserSchedulerParams).values(rows)
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={
+                    "weights": stmt.excluded.weights,
+                    "last_event_id": stmt.excluded.last_event_id,
+                    "reviews": stmt.excluded.reviews,
+                    "loss": stmt.excluded.loss,
+                    "fitted_at": stmt.excluded.fitted_at,
+                }
+            ))
+            await session.commit()
+
+    async def run_forever(self, interval: int = FSRS_OPTIMIZER_INTERVAL_SECONDS) -> None:
+        while True:
+            try:
+                fitted = await self.run_once()
+                if fitted:
+                    logger.info(f"Fitted FSRS weights for {fitted} users")
+            except Exception as e:
+                logger.error(f"Error in FSRS optimizer: {e}")
+            await asyncio.sleep(interval)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
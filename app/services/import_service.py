@@ -0,0 +1,134 @@
+import csv
+import io
+import logging
+import os
+from typing import Iterable
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.models import LanguageEnum, LevelEnum, Word
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted and committed together
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+LANGUAGES = {language.value for language in LanguageEnum}
+LEVELS = {level.value for level in LevelEnum}
+# Decoding with errors="replace" leaves this in place of bytes that aren't UTF-8
+REPLACEMENT_CHARACTER = "\ufffd"
+
+
+class WordImportService:
+    """Imports words from CSV rows in batches, skipping words that already exist"""
+
+    def __init__(self, session: AsyncSession, batch_size: int = IMPORT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        # Kept on the service so words committed before a failure are still counted
+        self.report = {"added": 0, "duplicates": 0, "errors": []}
+
+    async def import_rows(self, rows: Iterable[list[str]]) -> dict:
+        """
+        Import CSV rows (header already skipped).
+        Returns counts and a list of (line number, row, reason)
+        for every rejected row, including rows the CSV reader can't parse.
+        """
+        existing = await self._existing_keys()
+        report = self.report
+        batch = []
+        rows = iter(rows)
+
+        # Line 1 is the header
+        line_number = 1
+        while True:
+            line_number += 1
+            try:
+                row = next(rows)
+            except StopIteration:
+                break
+            except csv.Error as e:
+                # The reader carries on with the next line
+                report["errors"].append((line_number, [], f"can't parse row: {e}"))
+                continue
+
+            values, error = self._validate(row)
+            if error:
+                report["errors"].append((line_number, row, error))
+                continue
+
+            key = (values["word"], values["language"])
+            if key in existing:
+                report["duplicates"] += 1
+                continue
+            existing.add(key)
+
+            batch.append(values)
+            if len(batch) >= self.batch_size:
+                await self._insert_batch(batch, report)
+                batch = []
+
+        if batch:
+            await self._insert_batch(batch, report)
+
+        return report
+
+    async def _existing_keys(self) -> set:
+        """Load (word, language) pairs already in the database"""
+        existing = set()
+        result = await self.session.stream(
+            select(Word.word, Word.language).execution_options(yield_per=self.batch_size)
+        )
+        async for word, language in result:
+            existing.add((word, language))
+        await result.close()
+        return existing
+
+    async def _insert_batch(self, batch: list[dict], report: dict) -> None:
+        await self.session.execute(insert(Word), batch)
+        await self.session.commit()
+        report["added"] += len(batch)
+
+    def _validate(self, row: list[str]):
+        """Return (column values, None) for a valid row or (None, reason)"""
+        if len(row) < 5:
+            return None, "expected at least 5 columns"
+        if any(REPLACEMENT_CHARACTER in value for value in row):
+            return None, "not valid UTF-8"
+
+        word, translation, example, level, language = (value.strip() for value in row[:5])
+        audio_url = row[5].strip() if len(row) > 5 and row[5].strip() else None
+        level = level.upper()
+        language = language.lower()
+
+        if not word or not translation:
+            return None, "word and translation are required"
+        if len(word) > 100 or len(translation) > 100:
+            return None, "word and translation must be at most 100 characters"
+        if level not in LEVELS:
+            return None, f"unknown level '{level}'"
+        if language not in LANGUAGES:
+            return None, f"unknown language '{language}'"
+        if audio_url and len(audio_url) > 255:
+            return None, "audio_url must be at most 255 characters"
+
+        return {
+            "word": word,
+            "translation": translation,
+            "example": example or None,
+            "level": level,
+            "language": language,
+            "audio_url": audio_url,
+        }, None
+
+
+def build_error_report(errors: list) -> bytes:
+    """CSV file listing rejected rows and why they were rejected"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["line", "error", "row"])
+    for line_number, row, reason in errors:
+        writer.writerow([line_number, reason, ",".join(row)])
+    return output.getvalue().encode("utf-8")
@@ -0,0 +1,81 @@
+import os
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.models import UserWord
+from app.utils.cache import TTLCache
+
+# Per-user saved word sets; other processes' changes show up after the TTL
+known_words_cache = TTLCache(
+    maxsize=int(os.getenv("KNOWN_WORDS_CACHE_SIZE", "5000")),
+    ttl=int(os.getenv("KNOWN_WORDS_CACHE_TTL", "600"))
+)
+
+
+class KnownWordSet:
+    """Word ids a user has saved, one bit per word id up to the largest one"""
+
+    __slots__ = ("bits", "count")
+
+    def __init__(self, word_ids: Iterable[int] = ()):
+        self.bits = bytearray()
+        self.count = 0
+        for word_id in word_ids:
+            self.add(word_id)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, word_id: int) -> bool:
+        byte = word_id >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << (word_id & 7)))
+
+    def add(self, word_id: int) -> None:
+        byte = word_id >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        mask = 1 << (word_id & 7)
+        if not self.bits[byte] & mask:
+            self.bits[byte] |= mask
+            self.count += 1
+
+    def copy(self) -> "KnownWordSet":
+        known = KnownWordSet()
+        known.bits = bytearray(self.bits)
+        known.count = self.count
+        return known
+
+    def discard(self, word_id: int) -> None:
+        byte = word_id >> 3
+        mask = 1 << (word_id & 7)
+        if byte < len(self.bits) and self.bits[byte] & mask:
+            self.bits[byte] &= ~mask
+            self.count -= 1
+
+
+async def get_known_words(session: AsyncSession, user_id: int) -> KnownWordSet:
+    """The user's saved word ids, read from user_words on a cache miss"""
+    known = known_words_cache.get(user_id)
+    if known is None:
+        result = await session.execute(select(UserWord.word_id).where(UserWord.user_id == user_id))
+        known = KnownWordSet(result.scalars())
+        known_words_cache.set(user_id, known)
+    return known
+
+
+def mark_known(user_id: int, word_ids: Iterable[int]) -> None:
+    """Record saved words in the cached set, if the user has one"""
+    known = known_words_cache.get(user_id)
+    if known is not None:
+        for word_id in word_ids:
+            known.add(word_id)
+
+
+def mark_unknown(user_id: int, word_ids: Iterable[int]) -> None:
+    """Record removed words in the cached set, if the user has one"""
+    known = known_words_cache.get(user_id)
+    if known is not None:
+        for word_id in word_ids:
+            known.discard(word_id)
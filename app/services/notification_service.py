@@ -1,61 +1,75 @@
+import logging
+import os
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_
+from sqlalchemy import and_, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from app.database.models import User, UserWord, Word, Settings
 from app.keyboards.keyboards import review_now_keyboard
+from app.database.db import async_session
+from app.services.fanout import OutgoingMessage
+from app.services.outbox_service import OutboxService, OutboxWorker
+from app.services.review_service import REVIEW_SESSION_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor at a time
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "500"))
 
 class NotificationService:
     def __init__(self, session: AsyncSession, bot):
         self.session = session
         self.bot = bot
     
-    async def send_review_notifications(self):
+    async def send_review_notifications(self) -> dict:
         """
         Send notifications to users who have words due for review.
+        Reminders go through the outbox, so a run interrupted by a crash
+        resumes where it stopped and nobody gets the same reminder twice a day.
+        Returns the number of sent, failed, blocked and throttled messages.
         """
         now = datetime.utcnow()
+        campaign = f"review:{now.date().isoformat()}"
         
-        # Get users with notifications enabled and words to review
-        result = await self.session.execute(
-            select(User, Settings, UserWord, Word)
-            .join(Settings, User.id == Settings.user_id)
-            .join(UserWord, User.id == UserWord.user_id)
-            .join(Word, UserWord.word_id == Word.id)
-            .where(
-                and_(
-                    Settings.notify == True,
-                    UserWord.next_review <= now
-                )
-            )
-            .group_by(User.id, Settings.user_id, UserWord.id, Word.id)
-        )
-        
-        # Group by user
-        users_to_notify = {}
-        for user, settings, user_word, word in result:
-            if user.telegram_id not in users_to_notify:
-                users_to_notify[user.telegram_id] = {
-                    'user': user,
-                    'settings': settings,
-                    'words': []
-                }
-            
-            users_to_notify[user.telegram_id]['words'].append((user_word, word))
+        queued = await self.enqueue_review_notifications(now, campaign)
+        logger.info(f"Queued {queued} review notifications for {campaign}")
         
-        # Send notifications
-        for telegram_id, data in users_to_notify.items():
-            user = data['user']
-            words = data['words']
-            
-            if not words:
+        summary = await OutboxWorker(self.bot).drain(campaign)
+        logger.info(f"Review notifications finished: {summary}")
+        return summary
+    
+    async def enqueue_review_notifications(self, now: datetime, campaign: str) -> int:
+        """Write today's reminders to the outbox in batches"""
+        queued = 0
+        batch = []
+        # The cursor keeps a transaction open, so outbox writes use their own session
+        async with async_session() as outbox_session:
+            outbox = OutboxService(outbox_session)
+            async for message in self._review_reminders(now):
+                batch.append((f"{campaign}:{message.chat_id}", message))
+                if len(batch) >= NOTIFICATION_BATCH_SIZE:
+                    queued += await outbox.enqueue(campaign, batch)
+                    batch = []
+            queued += await outbox.enqueue(campaign, batch)
+        return queued
+    
+    async def _review_reminders(self, now: datetime):
+        """Yield one reminder per user, streamed from a server-side cursor"""
+        result = await self.session.stream(
+            self._due_summary_query(now).execution_options(yield_per=NOTIFICATION_BATCH_SIZE)
+        )
+        reply_markup = review_now_keyboard()
+        async for telegram_id, words_count, sample_words in result:
+            if not words_count:
                 continue
             
-            # Format notification message
-            words_count = len(words)
-            sample_words = [word.word for _, word in words[:3]]
+            if isinstance(sample_words, str):
+                sample_words = sample_words.split(",")
+            sample_words = list(sample_words or [])[:3]
             
+            # Format notification message
             message = (
                 f"🔔 <b>Time for a review!</b>\n\n"
                 f"You have {words_count} word{'s' if words_count > 1 else ''} "
@@ -65,20 +79,34 @@ class NotificationService:
                 f"Regular review is key to effective learning! 🧠"
             )
             
-            # Send notification
-            try:
-                await self.bot.send_message(
-                    telegram_id,
-                    message,
-                    parse_mode="HTML",
-                    reply_markup=review_now_keyboard()
+            yield OutgoingMessage(telegram_id, message, reply_markup)
+    
+    def _due_summary_query(self, now: datetime):
+        """One row per user with notifications on: due count and up to 3 due words"""
+        if self.session.bind.dialect.name == "postgresql":
+            sample_words = func.array_agg(
+                aggregate_order_by(Word.word, UserWord.next_review)
+            )[1:3]
+        else:
+            sample_words = func.group_concat(Word.word)
+        
+        return (
+            select(User.telegram_id, func.count(UserWord.id), sample_words)
+            .join(Settings, User.id == Settings.user_id)
+            .join(UserWord, User.id == UserWord.user_id)
+            .join(Word, UserWord.word_id == Word.id)
+            .where(
+                and_(
+                    Settings.notify == True,
+                    UserWord.next_review <= now
                 )
-            except Exception as e:
-                print(f"Failed to send notification to user {telegram_id}: {e}")
+            )
+            .group_by(User.id, User.telegram_id)
+        )
     
-    async def get_words_due_for_review(self, user_id: int):
+    async def get_words_due_for_review(self, user_id: int, limit: int = REVIEW_SESSION_SIZE):
         """
-        Get words that are due for review for a specific user.
+        Get the most overdue words that are due for review for a specific user.
         """
         now = datetime.utcnow()
         
@@ -91,6 +119,8 @@ class NotificationService:
                     UserWord.next_review <= now
                 )
             )
+            .order_by(UserWord.next_review)
+            .limit(limit)
         )
         
         return result.all() 
\ No newline at end of file
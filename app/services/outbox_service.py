@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import and_, delete, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.db import async_session, commit, dialect_insert
+from app.database.models import OutboxMessage
+from app.services.fanout import BLOCKED, FAILED, SENT, FanOutEngine, OutgoingMessage
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+# A claimed batch not finished within this time is picked up by another worker
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "3"))
+OUTBOX_RETRY_DELAY_SECONDS = int(os.getenv("OUTBOX_RETRY_DELAY_SECONDS", "60"))
+OUTBOX_POLL_SECONDS = int(os.getenv("OUTBOX_POLL_SECONDS", "30"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+# Message statuses
+PENDING = "pending"
+SENDING = "sending"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+
+
+def dump_markup(markup) -> Optional[str]:
+    if markup is None:
+        return None
+    return markup.model_dump_json(exclude_none=True)
+
+
+def load_markup(raw: Optional[str]):
+    if not raw:
+        return None
+    return InlineKeyboardMarkup.model_validate_json(raw)
+
+
+class OutboxService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def enqueue(
+        self, campaign: str, messages: Iterable[tuple[str, OutgoingMessage]], status: str = PENDING
+    ) -> int:
+        """
+        Store messages for delivery, skipping dedup keys that were already queued.
+        Messages stored as PAUSED wait for resume() before any worker sends them.
+        """
+        now = datetime.utcnow()
+        values = [
+            {
+                "campaign": campaign,
+                "dedup_key": dedup_key,
+                "chat_id": message.chat_id,
+                "text": message.text,
+                "reply_markup": dump_markup(message.reply_markup),
+                "status": status,
+                "attempts": 0,
+                "created_at": now,
+                "available_at": now,
+            }
+            for dedup_key, message in messages
+        ]
+        if not values:
+            return 0
+
+        result = await self.session.execute(
+            dialect_insert(self.session, OutboxMessage)
+            .values(values)
+            .on_conflict_do_nothing(index_elements=["dedup_key"])
+            .returning(OutboxMessage.id)
+        )
+        added = len(result.all())
+        await commit(self.session)
+        return added
+
+    async def claim_batch(
+        self, limit: int = OUTBOX_BATCH_SIZE, campaign: str = None, exclude: Iterable[str] = ()
+    ) -> list:
+        """Lock a batch of due messages for this worker; other workers skip them"""
+        now = datetime.utcnow()
+        claimable = or_(
+            OutboxMessage.status == PENDING,
+            # Batches left behind by a crashed worker
+            and_(
+                OutboxMessage.status == SENDING,
+                OutboxMessage.locked_at < now - timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            )
+        )
+        conditions = [claimable, OutboxMessage.available_at <= now]
+        if campaign is not None:
+            conditions.append(OutboxMessage.campaign == campaign)
+        exclude = list(exclude)
+        if exclude:
+            conditions.append(OutboxMessage.campaign.not_in(exclude))
+
+        ids = (
+            select(OutboxMessage.id)
+            .where(*conditions)
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids))
+            .values(status=SENDING, locked_at=now, attempts=OutboxMessage.attempts + 1)
+            .returning(
+                OutboxMessage.id, OutboxMessage.chat_id, OutboxMessage.text,
+                OutboxMessage.reply_markup, OutboxMessage.attempts
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = result.all()
+        await self.session.commit()
+        return sorted(rows, key=lambda row: row.id)
+
+    async def mark(self, outcomes: dict[int, str]) -> None:
+        """Record delivery outcomes for claimed messages"""
+        now = datetime.utcnow()
+        by_status = {}
+        for message_id, outcome in outcomes.items():
+            by_status.setdefault(outcome, []).append(message_id)
+
+        for outcome, ids in by_status.items():
+            if outcome == FAILED:
+                # Give failed messages another chance later, until attempts run out
+                await self.session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids), OutboxMessage.attempts < OUTBOX_MAX_ATTEMPTS)
+                    .values(
+                        status=PENDING,
+                        locked_at=None,
+                        available_at=now + timedelta(seconds=OUTBOX_RETRY_DELAY_SECONDS)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await self.session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids), OutboxMessage.status == SENDING)
+                    .values(status=FAILED, locked_at=None)
+                    .execution_options(synchronize_session=False)
+                )
+            else:
+                values = {"status": outcome, "locked_at": None}
+                if outcome == SENT:
+                    values["sent_at"] = now
+                await self.session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids))
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+
+        await self.session.commit()
+
+    async def release(self, ids: list[int], status: str = PENDING) -> None:
+        """Return claimed but unsent messages to the queue without counting an attempt"""
+        await self.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids), OutboxMessage.status == SENDING)
+            .values(status=status, locked_at=None, attempts=OutboxMessage.attempts - 1)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+
+    async def pause(self, campaign: str) -> int:
+        """Hold back unsent messages of a campaign from every worker"""
+        return await self._set_campaign_status(campaign, [PENDING], PAUSED)
+
+    async def resume(self, campaign: str) -> int:
+        return await self._set_campaign_status(campaign, [PAUSED], PENDING)
+
+    async def cancel(self, campaign: str) -> int:
+        """Cancel messages of a campaign that were not sent yet"""
+        return await self._set_campaign_status(campaign, [PENDING, PAUSED], CANCELLED)
+
+    async def _set_campaign_status(self, campaign: str, from_statuses: list[str], status: str) -> int:
+        result = await self.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.campaign == campaign, OutboxMessage.status.in_(from_statuses))
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
+        return result.rowcount
+
+    async def campaign_counts(self, campaign: str) -> dict:
+        """Number of messages per status for a campaign"""
+        result = await self.session.execute(
+            select(OutboxMessage.status, func.count())
+            .where(OutboxMessage.campaign == campaign)
+            .group_by(OutboxMessage.status)
+        )
+        return dict(result.all())
+
+    async def prune(self, retention_days: int = OUTBOX_RETENTION_DAYS) -> int:
+        """Delete finished messages older than the retention period"""
+        result = await self.session.execute(
+            delete(OutboxMessage).where(
+                OutboxMessage.status.in_([SENT, FAILED, BLOCKED, CANCELLED]),
+                OutboxMessage.created_at < datetime.utcnow() - timedelta(days=retention_days)
+            )
+        )
+        await self.session.commit()
+        return result.rowcount
+
+
+class OutboxWorker:
+    """Claims outbox batches with SKIP LOCKED and delivers them"""
+
+    def __init__(self, bot, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.bot = bot
+        self.batch_size = batch_size
+
+    async def drain(
+        self,
+        campaign: str = None,
+        engine: FanOutEngine = None,
+        stop: Callable[[], Optional[str]] = None,
+        exclude: Callable[[], Iterable[str]] = None,
+    ) -> dict:
+        """
+        Deliver pending messages until none are due, returns delivery counts.
+        stop() is checked before every message; when it returns a status the
+        unsent part of the claimed batch is released with that status.
+        Campaigns named by exclude(), asked before every batch, are left to the
+        drain that owns them.
+        """
+        engine = engine or FanOutEngine(self.bot)
+
+        while True:
+            if stop is not None and stop():
+                break
+            async with async_session() as session:
+                rows = await OutboxService(session).claim_batch(
+                    self.batch_size, campaign, exclude() if exclude is not None else ()
+                )
+            if not rows:
+                break
+
+            outcomes = {}
+
+            async def record(message: OutgoingMessage, outcome: str):
+                outcomes[message.key] = outcome
+
+            messages = [
+                OutgoingMessage(row.chat_id, row.text, load_markup(row.reply_markup), key=row.id)
+                for row in rows
+            ]
+            await engine.run(_iterate(messages, stop), on_result=record, stop=stop)
+
+            async with async_session() as session:
+                outbox = OutboxService(session)
+                await outbox.mark(outcomes)
+                unsent = [row.id for row in rows if row.id not in outcomes]
+                if unsent:
+                    await outbox.release(unsent, (stop and stop()) or PENDING)
+
+        return dict(engine.summary)
+
+    async def run_forever(
+        self, poll_interval: int = OUTBOX_POLL_SECONDS, exclude: Callable[[], Iterable[str]] = None
+    ) -> None:
+        """
+        Keep delivering whatever is queued, including work left by crashed processes.
+        exclude() names campaigns this process delivers itself, e.g. running broadcasts.
+        """
+        last_prune = None
+        while True:
+            try:
+                summary = await self.drain(exclude=exclude)
+                if summary[SENT] or summary[FAILED] or summary[BLOCKED]:
+                    logger.info(f"Outbox delivered: {summary}")
+
+                now = datetime.utcnow()
+                if last_prune is None or now - last_prune > timedelta(hours=1):
+                    async with async_session() as session:
+                        await OutboxService(session).prune()
+                    last_prune = now
+            except Exception as e:
+                logger.error(f"Error in outbox worker: {e}")
+            await asyncio.sleep(poll_interval)
+
+
+async def _iterate(items, stop=None):
+    for item in items:
+        if stop is not None and stop():
+            return
+        yield item
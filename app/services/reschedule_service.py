@@ -0,0 +1,104 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+import numpy as np
+from sqlalchemy.future import select
+
+from app.database.db import async_session, update_from_values
+from app.database.models import UserWord
+from app.services.review_buffer import review_buffer
+from app.services.fsrs_optimizer import load_user_weights
+from app.services.scheduler import FSRSScheduler, SchedulerEngine, get_engine
+
+logger = logging.getLogger(__name__)
+
+RESCHEDULE_CHUNK_SIZE = int(os.getenv("RESCHEDULE_CHUNK_SIZE", "20000"))
+
+
+async def reschedule_all(
+    engine: SchedulerEngine = None,
+    chunk_size: int = RESCHEDULE_CHUNK_SIZE,
+    on_progress: Callable[[int], object] = None,
+) -> int:
+    """
+    Rebuild the scheduler state and next review of every reviewed word with
+    `engine`, after the algorithm or its parameters changed. Rows are read by
+    id in chunks, recomputed with NumPy and written back one chunk per
+    transaction. Words that are already due stay due. Returns rows updated.
+    """
+    engine = engine or get_engine()
+    # Answers still in memory would be overwritten by the new states
+    await review_buffer.flush()
+
+    updated = 0
+    cursor = 0
+    started = time.monotonic()
+    while True:
+        async with async_session() as session:
+            result = await session.execute(
+                select(
+                    UserWord.id, UserWord.user_id, UserWord.review_count, UserWord.correct_count,
+                    UserWord.last_review, UserWord.next_review
+                )
+                .where(UserWord.id > cursor, UserWord.review_count > 0)
+                .order_by(UserWord.id)
+                .limit(chunk_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            user_weights = {}
+            if isinstance(engine, FSRSScheduler):
+                user_weights = await load_user_weights(session, (row.user_id for row in rows))
+            await update_from_values(session, UserWord, reschedule_rows(engine, rows, datetime.utcnow(), user_weights))
+            await session.commit()
+
+        cursor = rows[-1].id
+        updated += len(rows)
+        if on_progress is not None:
+            await on_progress(updated)
+
+    logger.info(f"Rescheduled {updated} words with {engine.name} in {time.monotonic() - started:.1f}s")
+    return updated
+
+
+def reschedule_rows(engine: SchedulerEngine, rows: list, now: datetime, user_weights: dict = None) -> list[dict]:
+    """New scheduler columns for a chunk of user_words rows"""
+    # Users with personal FSRS weights are replayed separately
+    user_weights = user_weights or {}
+    groups = {}
+    for i, row in enumerate(rows):
+        groups.setdefault(row.user_id if row.user_id in user_weights else None, []).append(i)
+
+    stability, difficulty, ease = np.zeros(len(rows)), np.zeros(len(rows)), np.zeros(len(rows))
+    intervals = np.zeros(len(rows), dtype=np.int64)
+    for user_id, indices in groups.items():
+        group_engine = engine if user_id is None else FSRSScheduler(
+            user_weights[user_id], engine.desired_retention, engine.max_interval
+        )
+        cards, group_intervals = group_engine.replay_batch(
+            np.fromiter((rows[i].review_count for i in indices), dtype=np.int64, count=len(indices)),
+            np.fromiter((rows[i].correct_count or 0 for i in indices), dtype=np.int64, count=len(indices)),
+        )
+        stability[indices], difficulty[indices], ease[indices] = cards.stability, cards.difficulty, cards.ease
+        intervals[indices] = group_intervals
+
+    changes = []
+    for i, row in enumerate(rows):
+        # Rows reviewed before the state was tracked are counted from now
+        anchor = row.last_review or now
+        next_review = anchor + timedelta(days=int(intervals[i]))
+        if row.next_review is not None and row.next_review <= now:
+            next_review = row.next_review
+        changes.append({
+            "id": row.id,
+            "next_review": next_review,
+            "stability": float(stability[i]),
+            "difficulty": float(difficulty[i]),
+            "ease": float(ease[i]),
+        })
+    return changes
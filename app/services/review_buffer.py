@@ -0,0 +1,277 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.future import select
+
+from app.database.db import async_session, dialect_insert, update_from_values
+from app.database.models import ReviewDailyStat, ReviewEvent, UserWord
+from app.services.fsrs_optimizer import load_user_weights
+from app.services.scheduler import CardState, FSRSScheduler, get_engine
+
+logger = logging.getLogger(__name__)
+
+# How often buffered review answers are written to user_words
+REVIEW_BUFFER_FLUSH_SECONDS = float(os.getenv("REVIEW_BUFFER_FLUSH_SECONDS", "5"))
+# Pending answers that trigger an immediate write
+REVIEW_BUFFER_SIZE = int(os.getenv("REVIEW_BUFFER_SIZE", "200"))
+# Failed flushes of the same answers before they are written in parts and bad ones dropped
+REVIEW_BUFFER_MAX_RETRIES = int(os.getenv("REVIEW_BUFFER_MAX_RETRIES", "3"))
+# Raw review events are kept this long, daily rollups are kept for good
+REVIEW_EVENTS_RETENTION_DAYS = int(os.getenv("REVIEW_EVENTS_RETENTION_DAYS", "90"))
+REVIEW_EVENTS_PRUNE_SECONDS = int(os.getenv("REVIEW_EVENTS_PRUNE_SECONDS", "3600"))
+
+# Review modes recorded in review_events
+REVIEW_MODE = "review"
+QUIZ_MODE = "quiz"
+FILL_IN_BLANK_MODE = "fill_in_blank"
+
+
+class ReviewResult(NamedTuple):
+    user_id: int
+    user_word_id: int
+    word_id: int
+    correct: bool
+    answered_at: datetime
+    mode: str
+    latency_ms: Optional[int] = None
+
+
+class ReviewBuffer:
+    """
+    Write-behind buffer for review answers. Answers are kept in memory and
+    applied to user_words with one batched UPDATE per flush, when enough of
+    them are pending or every flush interval. The same flush appends them to
+    review_events and adds them to the daily rollups.
+    """
+
+    def __init__(
+        self,
+        session_factory=async_session,
+        flush_interval: float = REVIEW_BUFFER_FLUSH_SECONDS,
+        flush_batch_size: int = REVIEW_BUFFER_SIZE,
+        max_retries: int = REVIEW_BUFFER_MAX_RETRIES,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self.max_retries = max_retries
+        self._pending: list[ReviewResult] = []
+        # Failed flushes in a row
+        self._failures = 0
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def has_pending(self, user_id: int) -> bool:
+        return any(result.user_id == user_id for result in self._pending)
+
+    async def add(self, result: ReviewResult) -> None:
+        self._pending.append(result)
+        if len(self._pending) >= self.flush_batch_size:
+            try:
+                await self.flush()
+            except Exception as e:
+                # The answers stay buffered and are retried by the periodic flush
+                logger.error(f"Failed to save review answers: {e}")
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def discard_user(self, user_id: int) -> None:
+        """Drop the user's pending answers, once a flush already writing them has finished"""
+        async with self._flush_lock:
+            self._pending = [result for result in self._pending if result.user_id != user_id]
+
+    async def flush_user(self, user_id: int) -> None:
+        """Write pending answers before this user's words are read, so they see their own answers"""
+        if self.has_pending(user_id):
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Apply all pending answers in one transaction"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            if self._failures >= self.max_retries:
+                # One bad answer must not hold back all the others
+                self._failures = 0
+                self._pending[:0] = await self._apply_in_parts(batch)
+                return
+            try:
+                async with self.session_factory() as session:
+                    await apply_review_results(session, batch)
+            except BaseException as e:
+                # Keep the answers for the next flush, ahead of newer ones
+                self._pending[:0] = batch
+                if isinstance(e, Exception):
+                    self._failures += 1
+                raise
+            self._failures = 0
+
+    async def _apply_in_parts(self, batch: list[ReviewResult]) -> list[ReviewResult]:
+        """
+        Apply a batch that keeps failing in halves, dropping single answers that
+        still fail. Returns the answers left for a later flush when the database
+        itself is unavailable.
+        """
+        try:
+            async with self.session_factory() as session:
+                await apply_review_results(session, batch)
+            return []
+        except (OperationalError, InterfaceError) as e:
+            logger.error(f"Failed to save review answers: {e}")
+            return batch
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Dropping review answer that can't be saved: {batch[0]}: {e}")
+                return []
+        middle = len(batch) // 2
+        left = await self._apply_in_parts(batch[:middle])
+        if left:
+            return left + batch[middle:]
+        return await self._apply_in_parts(batch[middle:])
+
+    async def prune(self, retention_days: int = REVIEW_EVENTS_RETENTION_DAYS) -> int:
+        """Delete review events older than the retention period, their rollups stay"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(ReviewEvent).where(ReviewEvent.ts < datetime.utcnow() - timedelta(days=retention_days))
+            )
+            await session.commit()
+        return result.rowcount
+
+    async def _flush_periodically(self) -> None:
+        last_prune = None
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if last_prune is None or loop.time() - last_prune > REVIEW_EVENTS_PRUNE_SECONDS:
+                    removed = await self.prune()
+                    if removed:
+                        logger.info(f"Removed {removed} old review events")
+                    last_prune = loop.time()
+            except Exception as e:
+                logger.error(f"Failed to save review answers: {e}")
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+def combine_results(batch: list[ReviewResult], rows: dict, user_weights: dict = None) -> list[dict]:
+    """
+    Fold the answers of a batch into one update per row. `rows` holds the
+    current user_words rows by id; answers for missing (deleted) rows are skipped.
+    `user_weights` holds personal FSRS weights by user id.
+    """
+    user_weights = user_weights or {}
+    engines = {}
+    changes = {}
+    for result in sorted(batch, key=lambda result: result.answered_at):
+        row = rows.get(result.user_word_id)
+        if row is None:
+            continue
+        change = changes.get(result.user_word_id)
+        if change is None:
+            card = CardState.from_row(row.review_count, row.stability, row.difficulty, row.ease)
+            change = {"card": card, "last_review": row.last_review, "reviews": 0, "correct": 0}
+            changes[result.user_word_id] = change
+
+        elapsed = (result.answered_at - change["last_review"]).total_seconds() / 86400 if change["last_review"] else 0.0
+        engine = engines.get(result.user_id)
+        if engine is None:
+            engine = engines[result.user_id] = get_engine(user_weights.get(result.user_id))
+        change["card"], days = engine.review(change["card"], result.correct, elapsed)
+        change["reviews"] += 1
+        change["correct"] += int(result.correct)
+        change["last_review"] = result.answered_at
+        change["next_review"] = result.answered_at + timedelta(days=days)
+
+    return [
+        {
+            "id": user_word_id,
+            "review_count": change["reviews"],
+            "correct_count": change["correct"],
+            "next_review": change["next_review"],
+            "last_review": change["last_review"],
+            "stability": change["card"].stability,
+            "difficulty": change["card"].difficulty,
+            "ease": change["card"].ease,
+        }
+        for user_word_id, change in changes.items()
+    ]
+
+
+def daily_totals(batch: list[ReviewResult]) -> list[dict]:
+    """review_daily_stats increments for a batch, one per user and day"""
+    totals = {}
+    for result in batch:
+        key = (result.user_id, result.answered_at.date())
+        row = totals.setdefault(key, {
+            "user_id": key[0], "day": key[1], "reviews": 0, "correct": 0, "latency_ms_sum": 0, "timed_reviews": 0,
+        })
+        row["reviews"] += 1
+        row["correct"] += int(result.correct)
+        if result.latency_ms is not None:
+            row["latency_ms_sum"] += result.latency_ms
+            row["timed_reviews"] += 1
+    return list(totals.values())
+
+
+async def apply_review_results(session, batch: list[ReviewResult]) -> None:
+    """Apply a batch of answers to user_words and the review log in one transaction"""
+    ids = {result.user_word_id for result in batch}
+    # Lock the rows so their state can't change between the read and the update
+    result = await session.execute(
+        select(
+            UserWord.id, UserWord.review_count, UserWord.stability,
+            UserWord.difficulty, UserWord.ease, UserWord.last_review
+        )
+        .where(UserWord.id.in_(ids))
+        .with_for_update()
+    )
+    rows = {row.id: row for row in result.all()}
+    user_weights = {}
+    if isinstance(get_engine(), FSRSScheduler):
+        user_weights = await load_user_weights(session, (result.user_id for result in batch))
+    await _log_review_events(session, batch)
+    await update_from_values(
+        session, UserWord, combine_results(batch, rows, user_weights), increment=("review_count", "correct_count")
+    )
+    await session.commit()
+
+
+async def _log_review_events(session, batch: list[ReviewResult]) -> None:
+    await session.execute(
+        insert(ReviewEvent),
+        [
+            {"user_id": result.user_id, "word_id": result.word_id, "ts": result.answered_at,
+             "correct": result.correct, "mode": result.mode, "latency_ms": result.latency_ms}
+            for result in batch
+        ]
+    )
+    stmt = dialect_insert(session, ReviewDailyStat).values(daily_totals(batch))
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={
+            "reviews": ReviewDailyStat.reviews + stmt.excluded.reviews,
+            "correct": ReviewDailyStat.correct + stmt.excluded.correct,
+            "latency_ms_sum": ReviewDailyStat.latency_ms_sum + stmt.excluded.latency_ms_sum,
+            "timed_reviews": ReviewDailyStat.timed_reviews + stmt.excluded.timed_reviews,
+        }
+    ))
+
+
+# Shared by all updates in this process
+review_buffer = ReviewBuffer()
@@ -0,0 +1,165 @@
+import os
+import random
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.models import UserWord, Word
+from app.services.review_buffer import review_buffer
+from app.services.word_catalog import CatalogWord, word_catalog
+
+# Answer options per question; unused slots in a plan are 0
+OPTIONS_PER_QUESTION = 4
+
+# Words per review session; larger backlogs are reviewed over several sessions
+REVIEW_SESSION_SIZE = int(os.getenv("REVIEW_SESSION_SIZE", "20"))
+# Most overdue words considered when ranking, as a multiple of the session size
+REVIEW_CANDIDATE_FACTOR = int(os.getenv("REVIEW_CANDIDATE_FACTOR", "3"))
+# How many days of overdueness a word that is always answered wrong is worth
+REVIEW_DIFFICULTY_WEIGHT = float(os.getenv("REVIEW_DIFFICULTY_WEIGHT", "7"))
+# Due counts stop here so counting stays cheap for huge backlogs
+REVIEW_COUNT_CAP = int(os.getenv("REVIEW_COUNT_CAP", "1000"))
+
+
+class ReviewPlan(NamedTuple):
+    """A review session as flat id lists, small enough to keep in FSM state"""
+    user_word_ids: list
+    word_ids: list
+    # OPTIONS_PER_QUESTION word ids per question, in display order
+    option_ids: list
+
+    def to_state(self) -> dict:
+        return {
+            "review_user_word_ids": self.user_word_ids,
+            "review_word_ids": self.word_ids,
+            "review_option_ids": self.option_ids,
+        }
+
+    @classmethod
+    def from_state(cls, data: dict) -> "ReviewPlan":
+        return cls(
+            data.get("review_user_word_ids", []),
+            data.get("review_word_ids", []),
+            data.get("review_option_ids", []),
+        )
+
+    def __len__(self) -> int:
+        return len(self.word_ids)
+
+
+class ReviewQuestion(NamedTuple):
+    user_word_id: int
+    word: CatalogWord
+    options: list
+    correct_index: int
+    # Position in the plan, past `index` when words were deleted since it was built
+    index: int
+
+
+class ReviewService:
+    """Builds review sessions up front so answering a question needs no lookups"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_due_queue(self, user_id: int, limit: int = REVIEW_SESSION_SIZE) -> list[tuple[int, int]]:
+        """
+        Up to `limit` due (user_word_id, word_id) pairs, most urgent first.
+        Only the most overdue candidates are read, via the (user_id, next_review)
+        index, and they are ranked by overdueness and how often they were missed.
+        """
+        await review_buffer.flush_user(user_id)
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            select(UserWord.id, UserWord.word_id, UserWord.next_review, UserWord.review_count, UserWord.correct_count)
+            .where(UserWord.user_id == user_id, UserWord.next_review <= now)
+            .order_by(UserWord.next_review)
+            .limit(limit * REVIEW_CANDIDATE_FACTOR)
+        )
+
+        def priority(row) -> float:
+            overdue_days = (now - row.next_review).total_seconds() / 86400
+            reviews = row.review_count or 0
+            # Smoothed share of wrong answers, 0.5 for words never reviewed
+            error_rate = (reviews - (row.correct_count or 0) + 1) / (reviews + 2)
+            return overdue_days + REVIEW_DIFFICULTY_WEIGHT * error_rate
+
+        ranked = sorted(result.all(), key=priority, reverse=True)
+        return [(row.id, row.word_id) for row in ranked[:limit]]
+
+    async def count_due(self, user_id: int, cap: int = REVIEW_COUNT_CAP) -> int:
+        """Number of due words, counted up to `cap`"""
+        await review_buffer.flush_user(user_id)
+        due = (
+            select(UserWord.id)
+            .where(UserWord.user_id == user_id, UserWord.next_review <= datetime.utcnow())
+            .limit(cap)
+            .subquery()
+        )
+        result = await self.session.execute(select(func.count()).select_from(due))
+        return result.scalar()
+
+    async def build_plan(self, user_id: int, limit: int = REVIEW_SESSION_SIZE) -> ReviewPlan:
+        """Take the most urgent due words and precompute shuffled options for each"""
+        await word_catalog.ensure_loaded(self.session)
+
+        user_word_ids, word_ids, option_ids = [], [], []
+        for user_word_id, word_id in await self.get_due_queue(user_id, limit):
+            word = await self._get_word(word_id)
+            if word is None:
+                continue
+            user_word_ids.append(user_word_id)
+            word_ids.append(word_id)
+            option_ids.extend(self._options_for(word))
+
+        return ReviewPlan(user_word_ids, word_ids, option_ids)
+
+    def _options_for(self, word: CatalogWord) -> list[int]:
+        # Words with look-alike translations make the question worth answering
+        options = [word.id] + [
+            distractor.id for distractor in word_catalog.distractors(word, OPTIONS_PER_QUESTION - 1)
+        ]
+        random.shuffle(options)
+        return options + [0] * (OPTIONS_PER_QUESTION - len(options))
+
+    async def get_question(self, plan: ReviewPlan, index: int) -> Optional[ReviewQuestion]:
+        """
+        The question at `index` with its options, skipping words deleted since
+        the plan was built; None when the plan is done
+        """
+        word = None
+        while word is None:
+            if index >= len(plan):
+                return None
+            word_id = plan.word_ids[index]
+            word = await self._get_word(word_id)
+            if word is None:
+                index += 1
+
+        option_ids = [
+            option_id
+            for option_id in plan.option_ids[index * OPTIONS_PER_QUESTION:(index + 1) * OPTIONS_PER_QUESTION]
+            if option_id
+        ]
+
+        options = []
+        for option_id in option_ids:
+            option = word if option_id == word_id else await self._get_word(option_id)
+            if option is not None:
+                options.append(option.translation)
+
+        return ReviewQuestion(plan.user_word_ids[index], word, options, options.index(word.translation), index)
+
+    async def _get_word(self, word_id: int) -> Optional[CatalogWord]:
+        word = word_catalog.get(word_id)
+        if word is None:
+            # Added after the catalog was loaded
+            row = await self.session.get(Word, word_id)
+            if row is not None:
+                word = CatalogWord(
+                    row.id, row.word, row.translation, row.example, row.level, row.language, row.audio_url
+                )
+        return word
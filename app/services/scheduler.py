@@ -0,0 +1,210 @@
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Which engine schedules reviews: "ladder", "sm2" or "fsrs"
+SCHEDULER_ENGINE = os.getenv("SCHEDULER_ENGINE", "ladder")
+SCHEDULER_MAX_INTERVAL_DAYS = int(os.getenv("SCHEDULER_MAX_INTERVAL_DAYS", "365"))
+# Share of words FSRS expects to be remembered when they come up for review
+FSRS_DESIRED_RETENTION = float(os.getenv("FSRS_DESIRED_RETENTION", "0.9"))
+
+# Days until the next review after the n-th correct answer
+LADDER_DAYS = (1, 3, 7, 14, 30, 60)
+
+SM2_DEFAULT_EASE = 2.5
+SM2_MIN_EASE = 1.3
+# Ease lost on a wrong answer, SM-2's change for quality 1
+SM2_LAPSE_PENALTY = 0.54
+
+# FSRS-4.5 default weights
+FSRS_DEFAULT_WEIGHTS = (
+    0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474,
+    0.1367, 1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755,
+)
+FSRS_DECAY = -0.5
+FSRS_FACTOR = 19 / 81
+# Grades used for the bot's right/wrong answers
+FSRS_AGAIN, FSRS_GOOD = 1, 3
+
+
+def fsrs_retrievability(elapsed_days, stability):
+    """FSRS probability of remembering a word `elapsed_days` after its last review"""
+    return (1 + FSRS_FACTOR * np.maximum(elapsed_days, 0) / stability) ** FSRS_DECAY
+
+
+class CardState(NamedTuple):
+    """
+    Scheduling state of one user_words row, or of many rows as NumPy arrays.
+    A stability of 0 means the word was never reviewed.
+    """
+    reviews: object
+    stability: object
+    difficulty: object
+    ease: object
+
+    @classmethod
+    def from_row(cls, review_count, stability, difficulty, ease) -> "CardState":
+        """State of a row, with the defaults for columns that were never set"""
+        return cls(
+            review_count or 0,
+            stability if stability is not None else 0.0,
+            difficulty if difficulty is not None else 0.0,
+            ease if ease is not None else SM2_DEFAULT_EASE,
+        )
+
+    @classmethod
+    def new_batch(cls, size: int) -> "CardState":
+        return cls(
+            np.zeros(size, dtype=np.int64),
+            np.zeros(size),
+            np.zeros(size),
+            np.full(size, SM2_DEFAULT_EASE),
+        )
+
+
+class SchedulerEngine:
+    """
+    A spaced-repetition algorithm. Engines implement review_batch() on NumPy
+    arrays, so rescheduling many rows and reviewing a single one share the code.
+    """
+    name = None
+
+    def __init__(self, max_interval: int = SCHEDULER_MAX_INTERVAL_DAYS):
+        self.max_interval = max_interval
+
+    def review_batch(self, cards: CardState, correct: np.ndarray, elapsed_days: np.ndarray) -> tuple[CardState, np.ndarray]:
+        """New states and whole days until the next review, after one answer per card"""
+        raise NotImplementedError
+
+    def review(self, card: CardState, correct: bool, elapsed_days: float = 0.0) -> tuple[CardState, int]:
+        """Review a single card"""
+        cards = CardState(*(np.array([value]) for value in card))
+        new_cards, interval = self.review_batch(cards, np.array([correct]), np.array([float(elapsed_days)]))
+        return CardState(*(value[0].item() for value in new_cards)), int(interval[0])
+
+    def replay_batch(self, review_count: np.ndarray, correct_count: np.ndarray) -> tuple[CardState, np.ndarray]:
+        """
+        Rebuild states from answer counts alone, for rows reviewed before this
+        engine was used. Wrong answers are assumed to come first and every
+        review to happen on time.
+        """
+        review_count = np.asarray(review_count, dtype=np.int64)
+        correct_count = np.minimum(np.asarray(correct_count, dtype=np.int64), review_count)
+        lapses = review_count - correct_count
+
+        cards = CardState.new_batch(len(review_count))
+        intervals = np.zeros(len(review_count), dtype=np.int64)
+        # Past this many answers the states no longer change meaningfully
+        steps = min(int(review_count.max(initial=0)), 100)
+        for step in range(steps):
+            active = step < review_count
+            reviewed, interval = self.review_batch(cards, step >= lapses, intervals.astype(float))
+            cards = CardState(*(np.where(active, new, old) for new, old in zip(reviewed, cards)))
+            intervals = np.where(active, interval, intervals)
+
+        return cards._replace(reviews=review_count), intervals
+
+    def _clip_interval(self, days: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(days), 1, self.max_interval).astype(np.int64)
+
+
+class LadderScheduler(SchedulerEngine):
+    """Fixed steps of 1, 3, 7, 14, 30 and 60 days, back to 1 day after a wrong answer"""
+    name = "ladder"
+
+    def review_batch(self, cards, correct, elapsed_days):
+        reviews = cards.reviews + 1
+        steps = np.array(LADDER_DAYS)[np.minimum(reviews, len(LADDER_DAYS) - 1)]
+        interval = self._clip_interval(np.where(correct, steps, 1))
+        return cards._replace(reviews=reviews, stability=interval.astype(float)), interval
+
+
+class SM2Scheduler(SchedulerEngine):
+    """
+    SuperMemo 2 with a right answer graded 4 and a wrong one graded 1.
+    Stability holds the current interval.
+    """
+    name = "sm2"
+
+    def review_batch(self, cards, correct, elapsed_days):
+        ease = np.where(correct, cards.ease, np.maximum(cards.ease - SM2_LAPSE_PENALTY, SM2_MIN_EASE))
+        interval = np.where(
+            cards.stability < 1, 1,
+            np.where(cards.stability < 6, 6, cards.stability * ease)
+        )
+        interval = self._clip_interval(np.where(correct, interval, 1))
+        return CardState(cards.reviews + 1, interval.astype(float), cards.difficulty, ease), interval
+
+
+class FSRSScheduler(SchedulerEngine):
+    """
+    FSRS-4.5 with a right answer graded Good and a wrong one Again.
+    Stability is in days, difficulty between 1 and 10.
+    """
+    name = "fsrs"
+
+    def __init__(
+        self,
+        weights: tuple = FSRS_DEFAULT_WEIGHTS,
+        desired_retention: float = FSRS_DESIRED_RETENTION,
+        max_interval: int = SCHEDULER_MAX_INTERVAL_DAYS,
+    ):
+        super().__init__(max_interval)
+        self.w = np.asarray(weights, dtype=float)
+        self.desired_retention = desired_retention
+
+    def initial_difficulty(self, grade) -> np.ndarray:
+        return np.clip(self.w[4] - (grade - FSRS_GOOD) * self.w[5], 1, 10)
+
+    def review_batch(self, cards, correct, elapsed_days):
+        w = self.w
+        new = cards.stability <= 0
+        grade = np.where(correct, FSRS_GOOD, FSRS_AGAIN)
+        # Avoid dividing by zero for new cards, their values are replaced below
+        stability = np.where(new, 1.0, cards.stability)
+        difficulty = np.where(new, self.initial_difficulty(FSRS_GOOD), cards.difficulty)
+
+        retrievability = fsrs_retrievability(elapsed_days, stability)
+        recalled = stability * (
+            1 + np.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+            * (np.exp(w[10] * (1 - retrievability)) - 1)
+        )
+        forgotten = np.minimum(
+            w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * np.exp(w[14] * (1 - retrievability)),
+            stability
+        )
+        next_difficulty = np.clip(
+            w[7] * self.initial_difficulty(FSRS_GOOD) + (1 - w[7]) * (difficulty - w[6] * (grade - FSRS_GOOD)),
+            1, 10
+        )
+
+        next_stability = np.where(
+            new, np.where(correct, w[FSRS_GOOD - 1], w[FSRS_AGAIN - 1]),
+            np.where(correct, recalled, forgotten)
+        )
+        next_difficulty = np.where(new, self.initial_difficulty(grade), next_difficulty)
+        interval = self._clip_interval(
+            next_stability / FSRS_FACTOR * (self.desired_retention ** (1 / FSRS_DECAY) - 1)
+        )
+        return CardState(cards.reviews + 1, next_stability, next_difficulty, cards.ease), interval
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (LadderScheduler, SM2Scheduler, FSRSScheduler)
+}
+
+_engine: Optional[SchedulerEngine] = None
+
+
+def get_engine(weights: tuple = None) -> SchedulerEngine:
+    """The engine chosen by SCHEDULER_ENGINE, with a user's own FSRS weights when given"""
+    global _engine
+    if _engine is None:
+        if SCHEDULER_ENGINE not in ENGINES:
+            raise ValueError(f"Unknown SCHEDULER_ENGINE {SCHEDULER_ENGINE!r}, expected one of {', '.join(ENGINES)}")
+        _engine = ENGINES[SCHEDULER_ENGINE]()
+    if weights is not None and isinstance(_engine, FSRSScheduler):
+        return FSRSScheduler(weights, _engine.desired_retention, _engine.max_interval)
+    return _engine
@@ -1,8 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, and_
+from sqlalchemy import func, true
 from datetime import datetime, timedelta
-from app.database.models import User, UserWord, Word
+import os
+from app.database.models import ReviewDailyStat, User, UserWord, Word
+from app.services.review_buffer import review_buffer
+from app.utils.cache import TTLCache
+
+# Per-user stats; entries are dropped when the user's words change
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "300"))
+stats_cache = TTLCache(maxsize=int(os.getenv("STATS_CACHE_SIZE", "10000")), ttl=STATS_CACHE_TTL)
+
+def invalidate_user_stats(user_id: int) -> None:
+    """Drop cached stats after the user's words were changed"""
+    stats_cache.pop(user_id)
 
 class StatsService:
     def __init__(self, session: AsyncSession):
@@ -10,71 +21,95 @@ class StatsService:
     
     async def get_user_stats(self, user_id: int) -> dict:
         """Get comprehensive statistics for a user"""
+        cached = stats_cache.get(user_id)
+        if cached is not None:
+            return cached
         
-        # Get total words being learned
-        result = await self.session.execute(
-            select(func.count()).select_from(UserWord).where(UserWord.user_id == user_id)
-        )
-        total_words = result.scalar() or 0
-        
-        # Get words that need review today
+        # Buffered answers count towards the stats
+        await review_buffer.flush_user(user_id)
         now = datetime.utcnow()
-        result = await self.session.execute(
-            select(func.count()).select_from(UserWord).where(
-                and_(
-                    UserWord.user_id == user_id,
-                    UserWord.next_review <= now
-                )
+        week_ago = now - timedelta(days=7)
+        
+        # All counters in one pass over the user's rows
+        counters = (
+            select(
+                func.count().label("total_words"),
+                func.count().filter(UserWord.next_review <= now).label("words_to_review"),
+                func.coalesce(func.sum(UserWord.correct_count), 0).label("correct_sum"),
+                func.coalesce(func.sum(UserWord.review_count), 0).label("review_sum"),
+                func.count().filter(UserWord.added_date >= week_ago).label("words_added_last_week"),
             )
+            .where(UserWord.user_id == user_id)
+            .subquery()
         )
-        words_to_review = result.scalar() or 0
         
-        # Get average correctness
-        result = await self.session.execute(
-            select(
-                func.sum(UserWord.correct_count),
-                func.sum(UserWord.review_count)
-            ).where(UserWord.user_id == user_id)
+        # Most recently added words
+        recent = (
+            select(Word.word, Word.translation, UserWord.review_count, UserWord.added_date)
+            .join(Word, UserWord.word_id == Word.id)
+            .where(UserWord.user_id == user_id)
+            .order_by(UserWord.added_date.desc())
+            .limit(5)
+            .subquery()
         )
-        correct_sum, review_sum = result.first()
         
-        correct_sum = correct_sum or 0
-        review_sum = review_sum or 0
+        # Attach the recent words to the counters row so both come back in one round-trip
+        result = await self.session.execute(
+            select(counters, recent.c.word, recent.c.translation, recent.c.review_count)
+            .select_from(counters.outerjoin(recent, true()))
+            .order_by(recent.c.added_date.desc())
+        )
+        rows = result.all()
+        first = rows[0]
         
-        if review_sum > 0:
-            accuracy = round((correct_sum / review_sum) * 100, 1)
+        if first.review_sum > 0:
+            accuracy = round((first.correct_sum / first.review_sum) * 100, 1)
         else:
             accuracy = 0
         
-        # Get words learned in the last 7 days
-        week_ago = now - timedelta(days=7)
-        result = await self.session.execute(
-            select(func.count()).select_from(UserWord).where(
-                and_(
-                    UserWord.user_id == user_id,
-                    UserWord.added_date >= week_ago
-                )
-            )
-        )
-        words_added_last_week = result.scalar() or 0
+        trend = await self.get_review_trend(user_id)
+        trend_reviews = sum(day["reviews"] for day in trend)
+        trend_correct = sum(day["correct"] for day in trend)
         
-        # Get most recently studied words
+        stats = {
+            "total_words": first.total_words,
+            "words_to_review": first.words_to_review,
+            "accuracy": accuracy,
+            "words_added_last_week": first.words_added_last_week,
+            "reviews_last_week": trend_reviews,
+            "accuracy_last_week": round(trend_correct / trend_reviews * 100, 1) if trend_reviews else 0,
+            "review_trend": trend,
+            "recent_words": [
+                (row.word, row.translation, row.review_count)
+                for row in rows if row.word is not None
+            ]
+        }
+        stats_cache.set(user_id, stats)
+        return stats
+    
+    async def get_review_trend(self, user_id: int, days: int = 7) -> list[dict]:
+        """Daily review totals for the last `days` days, oldest first, read from the rollups"""
+        today = datetime.utcnow().date()
+        first_day = today - timedelta(days=days - 1)
         result = await self.session.execute(
-            select(Word.word, Word.translation, UserWord.review_count).
-            join(Word, UserWord.word_id == Word.id).
-            where(UserWord.user_id == user_id).
-            order_by(UserWord.added_date.desc()).
-            limit(5)
+            select(
+                ReviewDailyStat.day, ReviewDailyStat.reviews, ReviewDailyStat.correct,
+                ReviewDailyStat.latency_ms_sum, ReviewDailyStat.timed_reviews
+            ).where(ReviewDailyStat.user_id == user_id, ReviewDailyStat.day >= first_day)
         )
-        recent_words = result.all()
+        by_day = {row.day: row for row in result.all()}
         
-        return {
-            "total_words": total_words,
-            "words_to_review": words_to_review,
-            "accuracy": accuracy,
-            "words_added_last_week": words_added_last_week,
-            "recent_words": recent_words
-        }
+        trend = []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            row = by_day.get(day)
+            trend.append({
+                "day": day,
+                "reviews": row.reviews if row else 0,
+                "correct": row.correct if row else 0,
+                "avg_latency_ms": row.latency_ms_sum // row.timed_reviews if row and row.timed_reviews else None,
+            })
+        return trend
     
     async def get_all_users_stats(self) -> list[dict]:
         """Get basic stats for all users (admin function)"""
@@ -1,7 +1,34 @@
+import os
+from typing import Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update
+from sqlalchemy import inspect, update
+from sqlalchemy.orm import make_transient_to_detached
+from app.database.db import after_commit, commit
 from app.database.models import User, Settings
+from app.utils.cache import TTLCache
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "600"))
+
+# (User, Settings) by telegram_id, shared by all updates
+user_cache = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")), ttl=USER_CACHE_TTL)
+# telegram_id by user id, so invalidate_user(user_id) doesn't scan user_cache
+telegram_ids = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")), ttl=USER_CACHE_TTL)
+
+def invalidate_user(user_id: int = None, telegram_id: int = None) -> None:
+    """Drop a cached user after their profile or settings changed"""
+    if telegram_id is None and user_id is not None:
+        telegram_id = telegram_ids.pop(user_id)
+    if telegram_id is not None:
+        user_cache.pop(telegram_id)
+
+def _detached_copy(instance):
+    """A copy of a loaded row that belongs to no session, so no commit or rollback can expire it"""
+    mapper = inspect(instance).mapper
+    copy = mapper.class_(**{attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs})
+    make_transient_to_detached(copy)
+    return copy
 
 class UserService:
     def __init__(self, session: AsyncSession):
@@ -13,6 +40,34 @@ class UserService:
         )
         return result.scalars().first()
     
+    async def get_user_context(self, telegram_id: int) -> tuple[Optional[User], Optional[Settings]]:
+        """User and settings for an update, from the cache when possible"""
+        cached = user_cache.get(telegram_id)
+        if cached is None:
+            result = await self.session.execute(
+                select(User, Settings)
+                .outerjoin(Settings, Settings.user_id == User.id)
+                .where(User.telegram_id == telegram_id)
+            )
+            row = result.first()
+            if row is None:
+                # Not registered yet, nothing to cache
+                return None, None
+            # The loaded rows belong to this update's session, which may roll back
+            user_cache.set(telegram_id, (
+                _detached_copy(row.User),
+                _detached_copy(row.Settings) if row.Settings is not None else None,
+            ))
+            telegram_ids.set(row.User.id, telegram_id)
+            return row.User, row.Settings
+        
+        # Fresh copies per update, without touching the session, so an update
+        # that never queries doesn't open a transaction
+        user, settings = cached
+        # Kept as long as the cached user, which may outlive it in LRU order
+        telegram_ids.set(user.id, telegram_id)
+        return _detached_copy(user), _detached_copy(settings) if settings is not None else None
+    
     async def create_user(self, telegram_id: int, name: str, language: str, level: str) -> User:
         user = User(
             telegram_id=telegram_id,
@@ -21,7 +76,7 @@ class UserService:
             level=level
         )
         self.session.add(user)
-        await self.session.commit()
+        await self.session.flush()
         
         # Create default settings for the user
         settings = Settings(
@@ -31,7 +86,8 @@ class UserService:
             language=language
         )
         self.session.add(settings)
-        await self.session.commit()
+        await commit(self.session)
+        after_commit(self.session, invalidate_user, None, telegram_id)
         
         return user
     
@@ -42,13 +98,15 @@ class UserService:
         await self.session.execute(
             update(Settings).where(Settings.user_id == user_id).values(language=language)
         )
-        await self.session.commit()
+        await commit(self.session)
+        after_commit(self.session, invalidate_user, user_id)
     
     async def update_user_level(self, user_id: int, level: str) -> None:
         await self.session.execute(
             update(User).where(User.id == user_id).values(level=level)
         )
-        await self.session.commit()
+        await commit(self.session)
+        after_commit(self.session, invalidate_user, user_id)
     
     async def get_user_settings(self, user_id: int) -> Settings:
         result = await self.session.execute(
@@ -67,4 +125,5 @@ class UserService:
             await self.session.execute(
                 update(Settings).where(Settings.user_id == user_id).values(**values)
             )
-            await self.session.commit() 
\ No newline at end of file
+            await commit(self.session)
+            after_commit(self.session, invalidate_user, user_id) 
\ No newline at end of file
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from array import array
+from typing import NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.db import async_session
+from app.database.models import Word
+from app.services.distractor_index import DistractorIndex, build_or_extend
+
+logger = logging.getLogger(__name__)
+
+# Rebuild the catalog periodically so words added by other processes show up
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "600"))
+# Random picks tried before scanning a bucket for words the user hasn't saved
+UNKNOWN_WORD_PROBES = 16
+
+
+class CatalogWord(NamedTuple):
+    """Read-only copy of a Word row with the same attribute names"""
+    id: int
+    word: str
+    translation: str
+    example: Optional[str]
+    level: str
+    language: str
+    audio_url: Optional[str]
+
+
+class CatalogBucket:
+    """Words of one (language, level) pair stored as parallel arrays"""
+
+    __slots__ = ("language", "level", "ids", "words", "translations", "examples", "audio_urls", "distractors")
+
+    def __init__(self, language: str, level: str):
+        self.language = language
+        self.level = level
+        self.ids = array("l")
+        self.words = []
+        self.translations = []
+        self.examples = []
+        self.audio_urls = []
+        self.distractors: Optional[DistractorIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, word_id: int, word: str, translation: str, example, audio_url) -> int:
+        self.ids.append(word_id)
+        self.words.append(word)
+        self.translations.append(translation)
+        self.examples.append(example)
+        self.audio_urls.append(audio_url)
+        return len(self.ids) - 1
+
+    def word_at(self, position: int) -> CatalogWord:
+        return CatalogWord(
+            id=self.ids[position],
+            word=self.words[position],
+            translation=self.translations[position],
+            example=self.examples[position],
+            level=self.level,
+            language=self.language,
+            audio_url=self.audio_urls[position],
+        )
+
+
+class WordCatalog:
+    """Process-local copy of the words table bucketed by (language, level)"""
+
+    def __init__(self):
+        self.buckets: dict[tuple[str, str], CatalogBucket] = {}
+        # word id -> (bucket, position inside the bucket)
+        self.positions: dict[int, tuple[CatalogBucket, int]] = {}
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.version = 0
+        self._lock = asyncio.Lock()
+        self._index_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def load(self, session: AsyncSession) -> None:
+        """(Re)build the catalog from the database"""
+        async with self._lock:
+            await self._load(session)
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        if self._is_fresh():
+            return
+        if self.loaded:
+            # Keep serving the current snapshot while a background task reloads it
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh())
+            return
+        async with self._lock:
+            # Another task may have loaded the catalog while we were waiting
+            if not self.loaded:
+                await self._load(session)
+
+    async def _refresh(self) -> None:
+        try:
+            async with self._lock:
+                if self._is_fresh():
+                    return
+                async with async_session() as session:
+                    await self._load(session)
+        except Exception as e:
+            # Try again after another refresh period instead of on every request
+            self.loaded_at = time.monotonic()
+            logger.error(f"Failed to refresh word catalog: {e}")
+
+    def _is_fresh(self) -> bool:
+        if not self.loaded:
+            return False
+        if CATALOG_REFRESH_SECONDS <= 0:
+            return self.loaded_at > float("-inf")
+        return time.monotonic() - self.loaded_at <= CATALOG_REFRESH_SECONDS
+
+    async def _load(self, session: AsyncSession) -> None:
+        buckets = {}
+        positions = {}
+        result = await session.execute(
+            select(
+                Word.id, Word.word, Word.translation, Word.example,
+                Word.level, Word.language, Word.audio_url
+            ).order_by(Word.id)
+        )
+        for word_id, word, translation, example, level, language, audio_url in result:
+            key = (language, level)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = CatalogBucket(language, level)
+            position = bucket.append(word_id, word, translation, example, audio_url)
+            positions[word_id] = (bucket, position)
+
+        stale = []
+        for key, bucket in buckets.items():
+            old = self.buckets.get(key)
+            index = old.distractors if old is not None else None
+            if index is not None and bucket.translations[:len(index)] == index.translations:
+                # Still valid for the words it covers, new words fall back to random picks
+                bucket.distractors = index
+            if bucket.distractors is None or len(bucket.distractors) != len(bucket):
+                stale.append(bucket)
+        
+        # Swap in the new buckets at once so readers never see a half-built catalog
+        self.buckets = buckets
+        self.positions = positions
+        self.loaded = True
+        self.loaded_at = time.monotonic()
+        self.version += 1
+        logger.info("Word catalog loaded: %s words in %s buckets", len(positions), len(buckets))
+        if stale:
+            self._index_task = asyncio.create_task(self._index_buckets(stale))
+
+    async def _index_buckets(self, buckets: list[CatalogBucket]) -> None:
+        """Build or extend distractor indexes in a thread, the event loop keeps serving updates"""
+        for bucket in buckets:
+            try:
+                bucket.distractors = await asyncio.to_thread(
+                    build_or_extend, bucket.distractors, list(bucket.translations)
+                )
+            except Exception as e:
+                logger.error(f"Failed to index distractors for {bucket.language}/{bucket.level}: {e}")
+        logger.info("Distractor index updated for %s buckets", len(buckets))
+
+    def invalidate(self) -> None:
+        """Make the next ensure_loaded() call start a reload"""
+        self.loaded_at = float("-inf")
+
+    def get_bucket(self, language: str, level: str) -> Optional[CatalogBucket]:
+        return self.buckets.get((language, level))
+
+    def get(self, word_id: int) -> Optional[CatalogWord]:
+        entry = self.positions.get(word_id)
+        if entry is None:
+            return None
+        bucket, position = entry
+        return bucket.word_at(position)
+
+    def random_word(self, language: str, level: str) -> Optional[CatalogWord]:
+        bucket = self.get_bucket(language, level)
+        if not bucket:
+            return None
+        return bucket.word_at(random.randrange(len(bucket)))
+
+    def random_unknown_word(self, language: str, level: str, known) -> Optional[CatalogWord]:
+        """
+        A random word whose id is not in `known`. Random probes find one in a
+        few tries unless most of the bucket is known, then the bucket is scanned.
+        """
+        bucket = self.get_bucket(language, level)
+        if not bucket:
+            return None
+        for _ in range(UNKNOWN_WORD_PROBES):
+            position = random.randrange(len(bucket))
+            if bucket.ids[position] not in known:
+                return bucket.word_at(position)
+
+        unknown = [position for position, word_id in enumerate(bucket.ids) if word_id not in known]
+        if not unknown:
+            return None
+        return bucket.word_at(random.choice(unknown))
+
+    def distractors(self, word: CatalogWord, count: int) -> list[CatalogWord]:
+        """
+        Up to `count` words of the same bucket whose translations are easy to
+        confuse with `word`'s, topped up with random words until its bucket is
+        indexed. No two of them, nor `word`, share a translation.
+        """
+        candidates = []
+        entry = self.positions.get(word.id)
+        if entry is not None:
+            bucket, position = entry
+            if bucket.distractors is not None:
+                neighbours = bucket.distractors.lookup(position).tolist()
+                random.shuffle(neighbours)
+                candidates = [bucket.word_at(neighbour) for neighbour in neighbours]
+        # A few extra random words so the word itself and duplicates can be skipped
+        candidates += self.sample_words(word.language, word.level, count + 3)
+
+        picked, translations = [], {word.translation.lower()}
+        for candidate in candidates:
+            if len(picked) == count:
+                break
+            if candidate.translation.lower() not in translations:
+                picked.append(candidate)
+                translations.add(candidate.translation.lower())
+        return picked
+
+    def sample_words(self, language: str, level: str, count: int) -> list[CatalogWord]:
+        bucket = self.get_bucket(language, level)
+        if not bucket:
+            return []
+        positions = random.sample(range(len(bucket)), min(count, len(bucket)))
+        return [bucket.word_at(position) for position in positions]
+
+
+word_catalog = WordCatalog()
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+from typing import NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.database.db import async_session
+from app.database.models import UserWord, Word
+from app.services.review_buffer import review_buffer
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+MY_WORDS_PAGE_SIZE = int(os.getenv("MY_WORDS_PAGE_SIZE", "10"))
+
+# UserPages by user_id, shared by all updates
+page_cache = TTLCache(
+    maxsize=int(os.getenv("MY_WORDS_CACHE_SIZE", "5000")),
+    ttl=int(os.getenv("MY_WORDS_CACHE_TTL", "300"))
+)
+
+# Keep references so running prefetches aren't garbage collected
+_prefetch_tasks: set = set()
+
+
+class UserPages:
+    """
+    A user's cached pages by cursor. Invalidation replaces it with an empty one
+    of the next generation, so fetches started before can tell their page is stale.
+    """
+
+    __slots__ = ("generation", "pages")
+
+    def __init__(self, generation: int = 0):
+        self.generation = generation
+        self.pages: dict[int, "WordListPage"] = {}
+
+
+class WordListEntry(NamedTuple):
+    user_word_id: int
+    word_id: int
+    word: str
+    translation: str
+    example: Optional[str]
+    audio_url: Optional[str]
+    review_count: int
+    correct_count: int
+
+
+class WordListPage(NamedTuple):
+    user_id: int
+    # The page holds the user's words with user_words.id > cursor
+    cursor: int
+    entries: tuple
+    has_next: bool
+
+    @property
+    def next_cursor(self) -> int:
+        return self.entries[-1].user_word_id if self.entries else self.cursor
+
+
+def _entries_query():
+    return (
+        select(
+            UserWord.id, UserWord.word_id, Word.word, Word.translation, Word.example,
+            Word.audio_url, UserWord.review_count, UserWord.correct_count
+        )
+        .join(Word, UserWord.word_id == Word.id)
+    )
+
+
+def invalidate_user_pages(user_id: int) -> None:
+    """Drop cached pages after the user's word list changed"""
+    cached = page_cache.get(user_id)
+    page_cache.set(user_id, UserPages(cached.generation + 1 if cached is not None else 1))
+
+
+def _cached_page(user_id: int, cursor: int) -> Optional["WordListPage"]:
+    cached = page_cache.get(user_id)
+    return cached.pages.get(cursor) if cached is not None else None
+
+
+class WordListService:
+    """Keyset pagination over a user's saved words, ordered by user_words.id"""
+
+    def __init__(self, session: AsyncSession, page_size: int = MY_WORDS_PAGE_SIZE):
+        self.session = session
+        self.page_size = page_size
+
+    async def get_page(self, user_id: int, cursor: int = 0) -> WordListPage:
+        """Words saved after the cursor, from the cache when possible"""
+        cached = page_cache.get(user_id)
+        if cached is not None and cursor in cached.pages:
+            return cached.pages[cursor]
+
+        generation = cached.generation if cached is not None else 0
+        page = await self._fetch_page(user_id, cursor)
+        cached = page_cache.get(user_id)
+        if cached is None and generation == 0:
+            cached = UserPages()
+            page_cache.set(user_id, cached)
+        # Not stored when the list changed while the page was being read
+        if cached is not None and cached.generation == generation:
+            cached.pages[cursor] = page
+        return page
+
+    async def _fetch_page(self, user_id: int, cursor: int) -> WordListPage:
+        # Review counts shown on the page include buffered answers
+        await review_buffer.flush_user(user_id)
+        # One extra row tells whether there is a next page
+        result = await self.session.execute(
+            _entries_query()
+            .where(UserWord.user_id == user_id, UserWord.id > cursor)
+            .order_by(UserWord.id)
+            .limit(self.page_size + 1)
+        )
+        rows = result.all()
+        entries = tuple(WordListEntry(*row) for row in rows[:self.page_size])
+        return WordListPage(user_id, cursor, entries, len(rows) > self.page_size)
+
+    async def get_previous_cursor(self, user_id: int, cursor: int) -> int:
+        """Cursor of the page before the one starting after `cursor`"""
+        if cursor <= 0:
+            return 0
+        # Walk back over the previous page using the same index
+        result = await self.session.execute(
+            select(UserWord.id)
+            .where(UserWord.user_id == user_id, UserWord.id <= cursor)
+            .order_by(UserWord.id.desc())
+            .limit(self.page_size + 1)
+        )
+        ids = result.scalars().all()
+        return ids[self.page_size] if len(ids) > self.page_size else 0
+
+    async def get_entry(self, user_id: int, user_word_id: int, cursor: int = None) -> Optional[WordListEntry]:
+        """A single saved word, looked up in the current page first"""
+        if cursor is not None:
+            page = _cached_page(user_id, cursor)
+            if page is not None:
+                for entry in page.entries:
+                    if entry.user_word_id == user_word_id:
+                        return entry
+
+        result = await self.session.execute(
+            _entries_query()
+            .where(UserWord.user_id == user_id, UserWord.id == user_word_id)
+        )
+        row = result.first()
+        return WordListEntry(*row) if row else None
+
+    def prefetch_next(self, page: WordListPage) -> None:
+        """Load the following page in the background so "Next" is served from memory"""
+        if not page.has_next or _cached_page(page.user_id, page.next_cursor) is not None:
+            return
+        task = asyncio.create_task(_prefetch(page.user_id, page.next_cursor, self.page_size))
+        _prefetch_tasks.add(task)
+        task.add_done_callback(_prefetch_tasks.discard)
+
+
+async def _prefetch(user_id: int, cursor: int, page_size: int) -> None:
+    # The handler's session is closed when the update finishes, use a separate one
+    try:
+        async with async_session() as session:
+            await WordListService(session, page_size).get_page(user_id, cursor)
+    except Exception as e:
+        logger.warning(f"Failed to prefetch word list page for user {user_id}: {e}")
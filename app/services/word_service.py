@@ -1,57 +1,108 @@
 from datetime import datetime, timedelta
-import random
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, func
-from app.database.models import Word, UserWord, User
+from sqlalchemy import delete
+from app.database.db import after_commit, commit, dialect_insert, on_commit
+from app.database.models import (
+    DailyWordQueue, ReviewDailyStat, ReviewEvent, User, UserSchedulerParams, UserWord, Word
+)
+from app.services.daily_queue_service import DailyQueueService
+from app.services.known_words import known_words_cache, mark_known, mark_unknown
+from app.services.review_buffer import ReviewResult, review_buffer
+from app.services.stats_service import invalidate_user_stats
+from app.services.word_catalog import CatalogWord, word_catalog
+from app.services.word_list_service import invalidate_user_pages
 
 class WordService:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def get_random_word(self, language: str, level: str) -> Word:
+    async def get_random_word(self, language: str, level: str) -> CatalogWord:
         """Get a random word for the learning mode"""
-        result = await self.session.execute(
-            select(Word).where(
-                Word.language == language,
-                Word.level == level
-            ).order_by(func.random()).limit(1)
-        )
-        return result.scalars().first()
+        await word_catalog.ensure_loaded(self.session)
+        return word_catalog.random_word(language, level)
     
-    async def get_random_words_for_quiz(self, language: str, level: str, count: int = 4) -> list[Word]:
-        """Get random words for quiz options"""
-        result = await self.session.execute(
-            select(Word).where(
-                Word.language == language,
-                Word.level == level
-            ).order_by(func.random()).limit(count)
-        )
-        return result.scalars().all()
+    async def get_new_word(self, user: User, words_per_day: int = None) -> tuple[Optional[CatalogWord], int]:
+        """
+        The next of today's new words for the user and how many are left after
+        it; (None, 0) once today's words_per_day words were shown
+        """
+        return await DailyQueueService(self.session).pop_word(user, words_per_day)
+    
+    async def get_random_words_for_quiz(self, language: str, level: str, count: int = 4) -> list[CatalogWord]:
+        """Get a random word followed by hard distractors for it"""
+        await word_catalog.ensure_loaded(self.session)
+        word = word_catalog.random_word(language, level)
+        if word is None:
+            return []
+        return [word] + word_catalog.distractors(word, count - 1)
+    
+    async def get_distractors(self, word_id: int, count: int = 3) -> list[CatalogWord]:
+        """Words whose translations are easy to confuse with the given word's"""
+        await word_catalog.ensure_loaded(self.session)
+        word = word_catalog.get(word_id)
+        if word is None:
+            return []
+        return word_catalog.distractors(word, count)
     
     async def add_word_to_user(self, user_id: int, word_id: int) -> UserWord:
         """Add a word to user's learning list"""
-        # Check if the word is already added
+        # The unique (user_id, word_id) index turns a repeated add into a no-op
         result = await self.session.execute(
-            select(UserWord).where(
-                UserWord.user_id == user_id,
-                UserWord.word_id == word_id
-            )
+            dialect_insert(self.session, UserWord)
+            .values(**self._new_user_word_values(user_id, word_id))
+            .on_conflict_do_nothing(index_elements=["user_id", "word_id"])
+            .returning(UserWord)
         )
-        existing = result.scalars().first()
+        user_word = result.scalars().first()
+        await commit(self.session)
+        after_commit(self.session, invalidate_user_stats, user_id)
+        after_commit(self.session, invalidate_user_pages, user_id)
+        on_commit(self.session, mark_known, user_id, [word_id])
         
-        if existing:
-            return existing
+        if user_word is None:
+            # Already in the list
+            result = await self.session.execute(
+                select(UserWord).where(
+                    UserWord.user_id == user_id,
+                    UserWord.word_id == word_id
+                )
+            )
+            user_word = result.scalars().first()
         
-        user_word = UserWord(
-            user_id=user_id,
-            word_id=word_id,
-            next_review=datetime.utcnow() + timedelta(days=1)
-        )
-        self.session.add(user_word)
-        await self.session.commit()
         return user_word
     
+    async def add_words_to_user(self, user_id: int, word_ids: list[int]) -> int:
+        """Add several words to user's learning list, returns how many were new"""
+        word_ids = list(dict.fromkeys(word_ids))
+        if not word_ids:
+            return 0
+        
+        result = await self.session.execute(
+            dialect_insert(self.session, UserWord)
+            .values([self._new_user_word_values(user_id, word_id) for word_id in word_ids])
+            .on_conflict_do_nothing(index_elements=["user_id", "word_id"])
+            .returning(UserWord.id)
+        )
+        added = len(result.all())
+        await commit(self.session)
+        after_commit(self.session, invalidate_user_stats, user_id)
+        after_commit(self.session, invalidate_user_pages, user_id)
+        on_commit(self.session, mark_known, user_id, word_ids)
+        return added
+    
+    def _new_user_word_values(self, user_id: int, word_id: int) -> dict:
+        now = datetime.utcnow()
+        return {
+            "user_id": user_id,
+            "word_id": word_id,
+            "added_date": now,
+            "next_review": now + timedelta(days=1),
+            "review_count": 0,
+            "correct_count": 0,
+        }
+    
     async def remove_word_from_user(self, user_id: int, word_id: int) -> bool:
         """Remove a word from user's learning list"""
         result = await self.session.execute(
@@ -60,9 +111,23 @@ class WordService:
                 UserWord.word_id == word_id
             )
         )
-        await self.session.commit()
+        await commit(self.session)
+        after_commit(self.session, invalidate_user_stats, user_id)
+        after_commit(self.session, invalidate_user_pages, user_id)
+        on_commit(self.session, mark_unknown, user_id, [word_id])
         return result.rowcount > 0
     
+    async def reset_progress(self, user_id: int) -> None:
+        """Delete the user's saved words, their review history and everything derived from it"""
+        # Buffered answers would otherwise be written back after the reset
+        await review_buffer.discard_user(user_id)
+        for model in (UserWord, ReviewEvent, ReviewDailyStat, UserSchedulerParams, DailyWordQueue):
+            await self.session.execute(delete(model).where(model.user_id == user_id))
+        await commit(self.session)
+        after_commit(self.session, invalidate_user_stats, user_id)
+        after_commit(self.session, invalidate_user_pages, user_id)
+        after_commit(self.session, known_words_cache.pop, user_id)
+    
     async def get_user_words(self, user_id: int) -> list[tuple[UserWord, Word]]:
         """Get all words added by user"""
         result = await self.session.execute(
@@ -72,49 +137,21 @@ class WordService:
         )
         return result.all()
     
-    async def get_words_for_review(self, user_id: int) -> list[tuple[UserWord, Word]]:
-        """Get words that need to be reviewed today"""
-        now = datetime.utcnow()
-        result = await self.session.execute(
-            select(UserWord, Word).join(Word, UserWord.word_id == Word.id).where(
-                UserWord.user_id == user_id,
-                UserWord.next_review <= now
-            )
+    async def update_review_status(
+        self,
+        user_word_id: int,
+        correct: bool,
+        user_id: int,
+        word_id: int,
+        mode: str,
+        latency_ms: int = None,
+    ) -> None:
+        """
+        Record a review answer. The row is updated and the answer logged by the
+        review buffer in a batch; reads of this user's stats and reviews flush it first.
+        """
+        await review_buffer.add(
+            ReviewResult(user_id, user_word_id, word_id, correct, datetime.utcnow(), mode, latency_ms)
         )
-        return result.all()
-    
-    async def update_review_status(self, user_word_id: int, correct: bool) -> None:
-        """Update the review status of a word"""
-        user_word = await self.session.get(UserWord, user_word_id)
-        if not user_word:
-            return
-        
-        # Update review count and correct count
-        user_word.review_count += 1
-        if correct:
-            user_word.correct_count += 1
-        
-        # Calculate next review based on spaced repetition algorithm
-        days_to_add = self._calculate_next_review_interval(user_word.review_count, correct)
-        user_word.next_review = datetime.utcnow() + timedelta(days=days_to_add)
-        
-        await self.session.commit()
-    
-    def _calculate_next_review_interval(self, review_count: int, correct: bool) -> int:
-        """Calculate days until next review using spaced repetition algorithm"""
-        if not correct:
-            return 1  # If answered incorrectly, review tomorrow
-        
-        # Simple spaced repetition formula
-        if review_count == 0:
-            return 1
-        elif review_count == 1:
-            return 3
-        elif review_count == 2:
-            return 7
-        elif review_count == 3:
-            return 14
-        elif review_count == 4:
-            return 30
-        else:
-            return 60  # Max interval is 60 days 
\ No newline at end of file
+        invalidate_user_stats(user_id)
+        invalidate_user_pages(user_id)
@@ -1,6 +1,6 @@
 import random
-from datetime import datetime, timedelta
-from typing import List, Tuple
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 
 def format_word_card(word, translation, example, audio_url=None):
     """Format a word card for display"""
@@ -15,13 +15,28 @@ def format_word_card(word, translation, example, audio_url=None):
     
     return card
 
+def format_word_list(entries):
+    """Format a page of the user's saved words for display"""
+    result = "📋 <b>Your Words</b>\n\n"
+    for entry in entries:
+        result += (
+            f"• <b>{entry.word}</b> - {entry.translation} "
+            f"({entry.correct_count}/{entry.review_count} correct)\n"
+        )
+    return result
+
 def format_user_stats(stats):
     """Format user statistics for display"""
     result = "📊 <b>Your Learning Stats</b>\n\n"
     result += f"📚 Total words: {stats['total_words']}\n"
     result += f"🔄 Words to review today: {stats['words_to_review']}\n"
     result += f"✅ Accuracy: {stats['accuracy']}%\n"
-    result += f"📈 Words added last week: {stats['words_added_last_week']}\n\n"
+    result += f"📈 Words added last week: {stats['words_added_last_week']}\n"
+    result += f"🗓 Answers last week: {stats['reviews_last_week']}"
+    if stats['reviews_last_week']:
+        result += f" ({stats['accuracy_last_week']}% correct)\n"
+        result += "Per day: " + " · ".join(str(day['reviews']) for day in stats['review_trend'])
+    result += "\n\n"
     
     if stats['recent_words']:
         result += "🔍 <b>Recently added words:</b>\n"
@@ -30,6 +45,14 @@ def format_user_stats(stats):
     
     return result
 
+def answer_latency_ms(asked_at, answered_at: datetime = None) -> Optional[int]:
+    """Milliseconds between showing a question and the answer, None when unknown"""
+    if not isinstance(asked_at, datetime):
+        # Telegram sends a zero date for messages the bot can no longer access
+        return None
+    answered_at = answered_at or datetime.now(timezone.utc)
+    return max(int((answered_at - asked_at).total_seconds() * 1000), 0)
+
 def generate_fill_in_blank(example, word):
     """Generate a fill in the blank exercise from an example sentence"""
     if not example or word not in example:
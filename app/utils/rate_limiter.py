@@ -0,0 +1,108 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+# Telegram Bot API limits: ~30 messages per second overall,
+# 1 message per second to the same private chat, 20 per minute to a group
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+# Messages a chat may receive back to back, e.g. a reply followed by a menu;
+# an occasional 429 from a longer burst is retried by RateLimitMiddleware
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_MAX_TRACKED_CHATS = int(os.getenv("TELEGRAM_MAX_TRACKED_CHATS", "10000"))
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of rejecting callers"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds to wait before using it"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    async def acquire(self) -> float:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        """Push every future reservation back by at least the given number of seconds"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+    def is_idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class TelegramRateLimiter:
+    """Global and per-chat token buckets matching Telegram's flood limits"""
+
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        group_rate: float = TELEGRAM_GROUP_RATE,
+        chat_burst: float = TELEGRAM_CHAT_BURST,
+        max_chats: int = TELEGRAM_MAX_TRACKED_CHATS,
+    ):
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_chats = max_chats
+        self._chats: OrderedDict = OrderedDict()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Negative chat ids are groups and channels
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, capacity=self.chat_burst)
+            self._evict()
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+    def _evict(self) -> None:
+        # Forget the least recently used chats whose buckets are full again
+        while len(self._chats) > self.max_chats:
+            chat_id, bucket = next(iter(self._chats.items()))
+            if not bucket.is_idle():
+                break
+            del self._chats[chat_id]
+
+    async def acquire(self, chat_id: int = None) -> float:
+        """Wait until a message to chat_id may be sent, returns seconds waited"""
+        waited = 0.0
+        if chat_id is not None:
+            # Wait for the chat first so a slow chat doesn't hold a global slot
+            waited += await self._chat_bucket(chat_id).acquire()
+        waited += await self.global_bucket.acquire()
+        return waited
+
+    def pause(self, seconds: float, chat_id: int = None) -> None:
+        """Apply a retry_after from Telegram to the chat or to all traffic"""
+        if chat_id is not None:
+            self._chat_bucket(chat_id).pause(seconds)
+        else:
+            self.global_bucket.pause(seconds)
+
+
+telegram_limiter = TelegramRateLimiter()
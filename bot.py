@@ -4,7 +4,6 @@ import os
 import sys
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
@@ -18,12 +17,28 @@ load_dotenv()
 
 # Import handlers after loading environment variables to avoid circular imports
 from app.handlers import registration, menu, learning, training, settings, admin, review
-from app.database.db import get_session
+from app.database.db import get_session, unit_of_work, warm_up_pool, dispose_engine
+from app.fsm.db_storage import DatabaseStorage
+from app.middlewares.rate_limit import rate_limit_middleware
+from app.middlewares.release_connection import ReleaseConnectionMiddleware
+from app.middlewares.user_middleware import UserMiddleware
 from app.services.notification_service import NotificationService
+from app.services.outbox_service import OutboxWorker
+from app.services.broadcast_service import active_broadcasts
+from app.services.daily_queue_service import build_daily_queues_nightly
+from app.services.review_buffer import review_buffer
+from app.services.fsrs_optimizer import FSRSOptimizer
+from app.services.scheduler import FSRSScheduler, get_engine
+from app.services.word_catalog import word_catalog
 
 # Initialize bot and dispatcher
 bot = Bot(token=os.getenv("BOT_TOKEN"), default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher(storage=MemoryStorage())
+# Give the update's database connection back before waiting on Telegram
+bot.session.middleware(ReleaseConnectionMiddleware())
+# Pace every outgoing API call to Telegram's flood limits
+bot.session.middleware(rate_limit_middleware)
+# Conversation state lives in the database so it survives restarts
+dp = Dispatcher(storage=DatabaseStorage())
 
 # Register all routers
 dp.include_router(registration.router)
@@ -34,13 +49,18 @@ dp.include_router(settings.router)
 dp.include_router(admin.router)
 dp.include_router(review.router)
 
-# Middleware to inject session into handlers
+# Middleware to inject session into handlers; the session is only created when
+# a handler uses it, and everything an update writes is committed once after
+# its handler returns, or rolled back if it fails
 @dp.update.outer_middleware()
 async def db_session_middleware(handler, event, data):
-    async for session in get_session():
+    async with unit_of_work() as session:
         data["session"] = session
         return await handler(event, data)
 
+# Resolve the sender's profile once per update, after the session is available
+dp.update.outer_middleware(UserMiddleware())
+
 # Function to send notifications
 async def send_notifications():
     while True:
@@ -65,11 +85,45 @@ async def send_notifications():
             await asyncio.sleep(3600)  # Wait an hour before retrying on error
 
 async def main():
+    # Fail fast on a misspelled SCHEDULER_ENGINE
+    logging.info(f"Scheduling reviews with {get_engine().name}")
+    
+    # Open database connections before the first update arrives
+    try:
+        await warm_up_pool()
+    except Exception as e:
+        logging.error(f"Failed to warm up database pool: {e}")
+    
+    # Load the word catalog so word picks don't hit the database
+    try:
+        async for session in get_session():
+            await word_catalog.load(session)
+    except Exception as e:
+        logging.error(f"Failed to load word catalog: {e}")
+    
     # Start the notification task
     asyncio.create_task(send_notifications())
     
+    # Deliver queued messages, including ones left over from a previous run
+    # Running broadcasts deliver their own messages so pause and cancel apply to all of them
+    asyncio.create_task(OutboxWorker(bot).run_forever(exclude=lambda: list(active_broadcasts)))
+    
+    # Prepare each active user's new words for the day ahead
+    asyncio.create_task(build_daily_queues_nightly())
+    
+    # Fit personal FSRS weights in worker processes
+    optimizer = FSRSOptimizer()
+    if isinstance(get_engine(), FSRSScheduler):
+        asyncio.create_task(optimizer.run_forever())
+    
     # Start polling
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # Write buffered review answers before the connections go away
+        await review_buffer.close()
+        optimizer.close()
+        await dispose_engine()
 
 if __name__ == "__main__":
     logging.info("Starting TalkeryBot...")
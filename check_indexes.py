@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Загрузка переменных окружения
+load_dotenv()
+
+from app.database.db import engine
+
+# Query shapes used by the services and the index each one is expected to use
+CHECKS = [
+    (
+        "StatsService.get_user_stats (added last week)",
+        "SELECT count(*) FROM user_words WHERE user_id = :user_id AND added_date >= :now",
+        "ix_user_words_user_id_added_date",
+    ),
+    (
+        "WordService.add_word_to_user",
+        "SELECT * FROM user_words WHERE user_id = :user_id AND word_id = :word_id",
+        "uq_user_words_user_id_word_id",
+    ),
+    (
+        "ReviewService.get_due_queue",
+        "SELECT id, word_id FROM user_words WHERE user_id = :user_id AND next_review <= :now "
+        "ORDER BY next_review LIMIT 60",
+        "ix_user_words_user_id_next_review",
+    ),
+    (
+        "WordListService.get_page",
+        "SELECT id FROM user_words WHERE user_id = :user_id AND id > :cursor ORDER BY id LIMIT 11",
+        "ix_user_words_user_id_id",
+    ),
+    (
+        "WordCatalog / words by language and level",
+        "SELECT id FROM words WHERE language = :language AND level = :level",
+        "ix_words_language_level",
+    ),
+]
+
+
+def _plan_indexes(plan: dict) -> set:
+    """Collect index names referenced anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    found = set()
+    if "Index Name" in plan:
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+
+async def check_indexes(force: bool = False) -> bool:
+    """Run EXPLAIN for every check and report whether the expected index is used"""
+    params = {"user_id": 1, "word_id": 1, "now": datetime.utcnow(), "language": "english", "level": "A1", "cursor": 0}
+    all_ok = True
+
+    async with engine.connect() as connection:
+        # A failed CREATE INDEX CONCURRENTLY leaves an index that exists but is never used
+        result = await connection.execute(text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+        ))
+        for index_name in result.scalars():
+            all_ok = False
+            logger.warning(f"INVALID  {index_name}: drop it and run the migration again")
+
+        if force:
+            # On small tables a sequential scan is cheaper; force index paths to prove they are usable
+            await connection.execute(text("SET enable_seqscan = off"))
+
+        for name, query, index_name in CHECKS:
+            result = await connection.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), params)
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            used = _plan_indexes(plan[0]["Plan"])
+
+            if index_name in used:
+                logger.info(f"OK    {name}: uses {index_name}")
+            else:
+                all_ok = False
+                logger.warning(f"MISS  {name}: expected {index_name}, plan uses {sorted(used) or 'no index'}")
+
+    await engine.dispose()
+    return all_ok
+
+
+if __name__ == "__main__":
+    # --force disables sequential scans, useful on a nearly empty database
+    ok = asyncio.run(check_indexes(force="--force" in sys.argv))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,80 @@
+"""Add lookup indexes to user_words and words
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    'ix_user_words_user_id_next_review',
+    'ix_user_words_user_id_added_date',
+    'uq_user_words_user_id_word_id',
+    'ix_words_language_level',
+]
+
+
+def _drop_invalid_indexes(names: list) -> None:
+    """
+    A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    if_not_exists would then skip forever; drop those so they are rebuilt
+    """
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+        ),
+        {"names": names}
+    ).scalars().all()
+    for name in invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def upgrade() -> None:
+    # The unique index can't be built while duplicate (user_id, word_id) pairs exist
+    op.execute(
+        """
+        DELETE FROM user_words a
+        USING user_words b
+        WHERE a.user_id = b.user_id
+          AND a.word_id = b.word_id
+          AND a.id > b.id
+        """
+    )
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        _drop_invalid_indexes(INDEXES)
+        op.create_index(
+            'ix_user_words_user_id_next_review', 'user_words', ['user_id', 'next_review'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_user_words_user_id_added_date', 'user_words', ['user_id', 'added_date'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'uq_user_words_user_id_word_id', 'user_words', ['user_id', 'word_id'],
+            unique=True, postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_words_language_level', 'words', ['language', 'level'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_words_language_level', table_name='words', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('uq_user_words_user_id_word_id', table_name='user_words', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_user_words_user_id_added_date', table_name='user_words', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_user_words_user_id_next_review', table_name='user_words', postgresql_concurrently=True, if_exists=True)
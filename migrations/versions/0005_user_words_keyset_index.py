@@ -0,0 +1,47 @@
+"""Add (user_id, id) index for paging through a user's words
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def _drop_invalid_indexes(names: list) -> None:
+    """
+    A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    if_not_exists would then skip forever; drop those so they are rebuilt
+    """
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+        ),
+        {"names": names}
+    ).scalars().all()
+    for name in invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+    with op.get_context().autocommit_block():
+        _drop_invalid_indexes(['ix_user_words_user_id_id'])
+        op.create_index(
+            'ix_user_words_user_id_id', 'user_words', ['user_id', 'id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_words_user_id_id', table_name='user_words', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,49 @@
+"""Add review_events log and review_daily_stats rollups
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('review_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('word_id', sa.Integer(), nullable=False),
+        sa.Column('ts', sa.DateTime(), nullable=False),
+        sa.Column('correct', sa.Boolean(), nullable=False),
+        sa.Column('mode', sa.String(length=16), nullable=False),
+        sa.Column('latency_ms', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_review_events_user_id_ts', 'review_events', ['user_id', 'ts'])
+    op.create_index('ix_review_events_ts', 'review_events', ['ts'])
+    op.create_table('review_daily_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('reviews', sa.Integer(), nullable=False),
+        sa.Column('correct', sa.Integer(), nullable=False),
+        sa.Column('latency_ms_sum', sa.BigInteger(), nullable=False),
+        sa.Column('timed_reviews', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('review_daily_stats')
+    op.drop_index('ix_review_events_ts', table_name='review_events')
+    op.drop_index('ix_review_events_user_id_ts', table_name='review_events')
+    op.drop_table('review_events')
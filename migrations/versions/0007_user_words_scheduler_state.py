@@ -0,0 +1,31 @@
+"""Add spaced-repetition scheduler state to user_words
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Nullable without defaults, so adding them doesn't rewrite the table
+    op.add_column('user_words', sa.Column('stability', sa.Float(), nullable=True))
+    op.add_column('user_words', sa.Column('difficulty', sa.Float(), nullable=True))
+    op.add_column('user_words', sa.Column('ease', sa.Float(), nullable=True))
+    op.add_column('user_words', sa.Column('last_review', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('user_words', 'last_review')
+    op.drop_column('user_words', 'ease')
+    op.drop_column('user_words', 'difficulty')
+    op.drop_column('user_words', 'stability')
@@ -0,0 +1,33 @@
+"""Add user_scheduler_params table for personal FSRS weights
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_scheduler_params',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('weights', sa.Text(), nullable=False),
+        sa.Column('last_event_id', sa.BigInteger(), nullable=False),
+        sa.Column('reviews', sa.Integer(), nullable=False),
+        sa.Column('loss', sa.Float(), nullable=True),
+        sa.Column('fitted_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_scheduler_params')
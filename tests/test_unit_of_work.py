@@ -0,0 +1,134 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import select, update
+
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db"
+
+from app.database.db import engine, on_commit, pool_metrics, release_connection, unit_of_work
+from app.database.models import Base, Settings, User
+from app.services.user_service import UserService, user_cache
+
+
+async def _setup():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    async with unit_of_work() as session:
+        session.add(User(id=1, telegram_id=100, name="Ann", language="english", level="A1"))
+        session.add(Settings(user_id=1, notify=True, words_per_day=5, language="english"))
+    user_cache.clear()
+
+
+def test_cached_user_survives_failed_update():
+    async def scenario():
+        await _setup()
+
+        # The first update caches the user, then its handler fails and the unit of work rolls back
+        with pytest.raises(RuntimeError):
+            async with unit_of_work() as session:
+                user, _ = await UserService(session).get_user_context(100)
+                raise RuntimeError("handler failed")
+
+        # The next update is served from the cache and can still read the profile
+        async with unit_of_work() as session:
+            user, settings = await UserService(session).get_user_context(100)
+            return user.name, settings.words_per_day
+
+    assert asyncio.run(scenario()) == ("Ann", 5)
+
+
+def test_handler_writes_commit_once_or_roll_back():
+    async def scenario():
+        await _setup()
+
+        async with unit_of_work() as session:
+            await UserService(session).update_user_level(1, "B1")
+
+        with pytest.raises(RuntimeError):
+            async with unit_of_work() as session:
+                await UserService(session).update_user_level(1, "C1")
+                raise RuntimeError("handler failed")
+
+        async with unit_of_work() as session:
+            user, _ = await UserService(session).get_user_context(100)
+            return user.level
+
+    assert asyncio.run(scenario()) == "B1"
+
+
+def test_cache_hit_runs_no_statement():
+    async def scenario():
+        await _setup()
+        async with unit_of_work() as session:
+            await UserService(session).get_user_context(100)
+
+        before = dict(pool_metrics)
+        async with unit_of_work() as session:
+            user, _ = await UserService(session).get_user_context(100)
+            created = session.created
+        return user.name, created, pool_metrics["updates"] - before["updates"], \
+            pool_metrics["db_updates"] - before["db_updates"], pool_metrics["checkouts"] - before["checkouts"]
+
+    assert asyncio.run(scenario()) == ("Ann", None, 1, 0, 0)
+
+
+def test_release_connection_ends_only_read_only_transactions():
+    async def scenario():
+        await _setup()
+        async with unit_of_work() as session:
+            user, _ = await UserService(session).get_user_context(100)
+            await release_connection()
+            released = not session.in_transaction()
+            # Objects loaded before the commit are still readable
+            return released, user.name
+
+    assert asyncio.run(scenario()) == (True, "Ann")
+
+
+def test_release_connection_keeps_writes_atomic():
+    async def scenario():
+        await _setup()
+        with pytest.raises(RuntimeError):
+            async with unit_of_work() as session:
+                await UserService(session).update_user_level(1, "B2")
+                await release_connection()
+                assert session.in_transaction()
+                raise RuntimeError("handler failed after answering")
+
+        async with unit_of_work() as session:
+            return (await session.execute(select(User.level).where(User.id == 1))).scalar()
+
+    assert asyncio.run(scenario()) == "A1"
+
+
+def test_core_write_without_commit_is_kept():
+    async def scenario():
+        await _setup()
+        async with unit_of_work() as session:
+            # No commit() call, the unit of work still has to save it
+            await session.execute(update(User).where(User.id == 1).values(level="C2"))
+
+        async with unit_of_work() as session:
+            return (await session.execute(select(User.level).where(User.id == 1))).scalar()
+
+    assert asyncio.run(scenario()) == "C2"
+
+
+def test_on_commit_skips_rolled_back_updates():
+    calls = []
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            async with unit_of_work() as session:
+                on_commit(session, calls.append, "rolled back")
+                raise RuntimeError("handler failed")
+
+        async with unit_of_work() as session:
+            on_commit(session, calls.append, "committed")
+            assert calls == []
+
+    asyncio.run(scenario())
+    assert calls == ["committed"]